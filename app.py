@@ -1,12 +1,13 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import json
 import os
 from datetime import datetime
-import time
-from urllib.parse import urljoin
-import re
+
+import metrics
+
+from assistant import chat_with_openai
+from catalog_worker import CatalogWorker
+from history import ConversationHistory
 
 # Page configuration
 st.set_page_config(
@@ -73,297 +74,196 @@ st.markdown("""
 # Initialize session state
 if 'messages' not in st.session_state:
     st.session_state.messages = []
-if 'scraped_data' not in st.session_state:
-    st.session_state.scraped_data = None
 if 'openai_api_key' not in st.session_state:
     st.session_state.openai_api_key = os.getenv('OPENAI_API_KEY', '')
+if 'history' not in st.session_state:
+    st.session_state.history = ConversationHistory()
 
-# Enhanced Web Scraper Class
-class LaFianceeJoyasScraper:
-    def __init__(self):
-        self.base_url = "https://lafianceejoyas.co"
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        self.data = {
-            'products': [],
-            'categories': [],
-            'company_info': {
-                'name': 'La Fiancee Joyas',
-                'description': 'Joyas en Oro 18k - Joyas Únicas',
-                'currency': 'COP',
-                'country': 'Colombia',
-                'website': 'lafianceejoyas.co',
-                'instagram': '@lafianceejoyas'
-            }
-        }
-    
-    def scrape_product_page(self, url):
-        """Scrape detailed product information from product page"""
-        try:
-            response = requests.get(url, headers=self.headers, timeout=15)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            product = {}
-            
-            # Extract product title
-            title_elem = soup.find('h1', class_='product-title')
-            if not title_elem:
-                title_elem = soup.find('h1')
-            product['name'] = title_elem.text.strip() if title_elem else url.split('/')[-1].replace('-', ' ').title()
-            
-            # Extract price - try multiple methods
-            price_elem = (
-                soup.find('span', class_='money') or 
-                soup.find('span', {'data-product-price': True}) or
-                soup.find('span', class_='price') or
-                soup.find('div', class_='product-price')
-            )
-            if price_elem:
-                price_text = price_elem.text.strip()
-                # Extract numeric value
-                price_match = re.search(r'[\d,.]+', price_text.replace('.', '').replace(',', ''))
-                if price_match:
-                    product['price'] = f"${price_match.group()}"
-            
-            # Extract description
-            desc_elem = (
-                soup.find('div', class_='product-description') or 
-                soup.find('div', {'itemprop': 'description'}) or
-                soup.find('div', class_='description')
-            )
-            if desc_elem:
-                product['description'] = desc_elem.text.strip()[:500]
-            
-            # Extract specifications from description or meta
-            full_text = product.get('description', '') + ' ' + product['name']
-            product['material'] = self.extract_material(full_text)
-            product['weight'] = self.extract_weight(full_text)
-            product['size'] = self.extract_size(full_text)
-            product['category'] = self.categorize_product(product['name'])
-            product['url'] = url
-            
-            return product
-        except Exception as e:
-            print(f"Error scraping product {url}: {e}")
-            return None
-    
-    def scrape_homepage(self):
-        """Scrape homepage and collection pages for products"""
-        try:
-            # Scrape main page
-            response = requests.get(self.base_url, headers=self.headers, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find all product links
-            product_links = set()
-            
-            # Method 1: Look for product links
-            for link in soup.find_all('a', href=True):
-                href = link.get('href', '')
-                if '/products/' in href:
-                    full_url = urljoin(self.base_url, href)
-                    # Clean URL (remove query parameters)
-                    clean_url = full_url.split('?')[0]
-                    product_links.add(clean_url)
-            
-            # Method 2: Try collections
-            collections = [
-                '/collections/all', 
-                '/collections/cadenas', 
-                '/collections/pulseras', 
-                '/collections/aretes', 
-                '/collections/anillos', 
-                '/collections/dijes',
-                '/collections/joyas'
-            ]
-            
-            for collection in collections:
-                try:
-                    col_response = requests.get(self.base_url + collection, headers=self.headers, timeout=10)
-                    col_soup = BeautifulSoup(col_response.content, 'html.parser')
-                    
-                    for link in col_soup.find_all('a', href=True):
-                        href = link.get('href', '')
-                        if '/products/' in href:
-                            full_url = urljoin(self.base_url, href)
-                            clean_url = full_url.split('?')[0]
-                            product_links.add(clean_url)
-                    
-                    time.sleep(0.5)  # Be polite to server
-                except:
-                    continue
-            
-            # Scrape each product page (limit to 60 for performance)
-            total_links = list(product_links)[:60]
-            progress_text = st.empty()
-            
-            for idx, url in enumerate(total_links):
-                progress_text.text(f"Escaneando producto {idx + 1} de {len(total_links)}...")
-                
-                product_data = self.scrape_product_page(url)
-                if product_data:
-                    self.data['products'].append(product_data)
-                
-                time.sleep(0.3)  # Be polite to server
-            
-            progress_text.empty()
-            
-            # Extract unique categories
-            self.data['categories'] = list(set([p['category'] for p in self.data['products'] if p.get('category')]))
-            
-            return len(self.data['products']) > 0
-        except Exception as e:
-            st.error(f"Error durante el escaneo: {e}")
-            return False
-    
-    def categorize_product(self, name):
-        """Categorize product based on name"""
-        name_lower = name.lower()
-        if 'cadena' in name_lower:
-            return 'Cadenas'
-        elif 'pulso' in name_lower or 'pulsera' in name_lower or 'brazalete' in name_lower:
-            return 'Pulseras'
-        elif 'topo' in name_lower or 'arete' in name_lower or 'pendiente' in name_lower:
-            return 'Aretes'
-        elif 'anillo' in name_lower or 'argolla' in name_lower:
-            return 'Anillos'
-        elif 'dije' in name_lower or 'colgante' in name_lower or 'medalla' in name_lower:
-            return 'Dijes'
-        return 'Joyas'
-    
-    def extract_material(self, text):
-        """Extract material from text"""
-        text_lower = text.lower()
-        if 'oro amarillo' in text_lower:
-            return 'Oro Amarillo 18K'
-        elif 'oro blanco' in text_lower:
-            return 'Oro Blanco 18K'
-        elif 'oro rosa' in text_lower or 'oro rosado' in text_lower:
-            return 'Oro Rosa 18K'
-        elif 'tres oros' in text_lower or '3 oros' in text_lower:
-            return 'Tres Oros 18K'
-        elif 'oro' in text_lower:
-            return 'Oro 18K'
-        return 'Oro 18K'
-    
-    def extract_weight(self, text):
-        """Extract weight from text"""
-        weight_match = re.search(r'(\d+[,.]?\d*)\s*gr', text.lower())
-        if weight_match:
-            return weight_match.group(1) + 'gr'
-        return None
-    
-    def extract_size(self, text):
-        """Extract size/length from text"""
-        size_match = re.search(r'(\d+)\s*cm', text.lower())
-        if size_match:
-            return size_match.group(1) + 'cm'
-        # Also look for mm
-        size_match = re.search(r'(\d+)\s*mm', text.lower())
-        if size_match:
-            return size_match.group(1) + 'mm'
-        return None
-
-# OpenAI Chat Function
-def chat_with_openai(messages, api_key, knowledge_base):
-    """Chat with OpenAI API with enhanced conversational abilities"""
-    try:
-        from openai import OpenAI
-        
-        client = OpenAI(api_key=api_key)
-        
-        # Create detailed product catalog from REAL scraped data
-        products_info = []
-        for p in knowledge_base['products']:
-            product_str = f"- {p['name']}"
-            if p.get('price'):
-                product_str += f" - Precio: {p['price']} COP"
-            if p.get('category'):
-                product_str += f" - Categoría: {p['category']}"
-            if p.get('material'):
-                product_str += f" - Material: {p['material']}"
-            if p.get('weight'):
-                product_str += f" - Peso: {p['weight']}"
-            if p.get('size'):
-                product_str += f" - Tamaño: {p['size']}"
-            if p.get('description'):
-                product_str += f" - Descripción: {p['description'][:100]}"
-            if p.get('url'):
-                product_str += f" - URL: {p['url']}"
-            products_info.append(product_str)
-        
-        products_catalog = "\n".join(products_info)
-        
-        # Enhanced system prompt for conversational AI
-        system_prompt = f"""Eres un asesor experto y amigable de La Fiancee Joyas, una joyería colombiana especializada en oro 18K italiano de alta calidad.
-
-INFORMACIÓN DE LA EMPRESA:
-- Nombre: La Fiancee Joyas
-- Especialidad: Joyas en Oro 18K (amarillo, blanco, rosa y tres oros)
-- Productos: Cadenas, pulseras, aretes, anillos y dijes
-- Moneda: Pesos colombianos (COP)
-- Sitio web: lafianceejoyas.co
-- Instagram: @lafianceejoyas
-
-CATÁLOGO COMPLETO DE PRODUCTOS (EXTRAÍDO DEL SITIO WEB REAL):
-{products_catalog}
-
-CATEGORÍAS DISPONIBLES:
-{', '.join(knowledge_base['categories'])}
-
-TU ROL Y PERSONALIDAD:
-- Eres un asesor experto pero cercano y conversacional
-- Entiendes las ocasiones especiales (bodas, aniversarios, regalos, compromiso)
-- Haces preguntas para entender mejor las necesidades del cliente
-- Das recomendaciones personalizadas basadas en el presupuesto y ocasión
-- Usas emojis moderadamente para ser más cálido
-- Hablas de manera natural, no como un robot
-
-CÓMO RESPONDER SEGÚN LA OCASIÓN:
-1. **Para Compromiso/Boda**: Recomienda anillos elegantes del catálogo real, menciona la importancia del oro 18K para una pieza tan especial
-2. **Para Regalo de Novia/Esposa**: Sugiere cadenas, pulseras o aretes del catálogo según estilo (clásico, moderno)
-3. **Para Uso Diario**: Recomienda piezas versátiles y duraderas del inventario
-4. **Para Ocasión Especial**: Piezas más llamativas o con diseños únicos que tengamos en stock
-
-REGLAS CRÍTICAS:
-- SOLO menciona productos que estén en el catálogo anterior
-- SIEMPRE usa los precios exactos del catálogo (si están disponibles)
-- Si un precio no está disponible, di "Consultar precio en lafianceejoyas.co o Instagram @lafianceejoyas"
-- Incluye el link del producto cuando sea relevante
-- NO inventes productos, precios o características que no estén en el catálogo
-- Si el cliente pregunta por algo que no tenemos, sugiere alternativas REALES del catálogo
-- Sé conversacional: "¡Qué emoción! Para un compromiso te recomendaría..." en lugar de respuestas secas
-
-PREGUNTAS QUE PUEDES HACER:
-- ¿Para qué ocasión es la joya?
-- ¿Qué estilo prefiere? (clásico, moderno, minimalista)
-- ¿Tienes algún presupuesto en mente?
-- ¿Prefiere oro amarillo, blanco o rosa?
-- ¿Es para uso diario o ocasiones especiales?
-
-INFORMACIÓN ADICIONAL:
-- Garantía: Todas las joyas son 100% oro 18K italiano con certificado
-- Envíos: Sí, a toda Colombia (consultar detalles por Instagram)
-- Cuidado: Evitar químicos, guardar en lugar seco, limpiar con paño suave
-- Personalización: Consultar disponibilidad por Instagram @lafianceejoyas
-- Tienda física: Contactar por Instagram para ubicación"""
-
-        # Prepare messages
-        api_messages = [{"role": "system", "content": system_prompt}] + messages
-        
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=api_messages,
-            temperature=0.8,
-            max_tokens=800
+@st.cache_resource
+def get_catalog_worker():
+    """The process-wide catalog worker, shared by every session"""
+    metrics.setup_logging()
+    metrics.start_exporters()
+    worker = CatalogWorker()
+    worker.start()
+    return worker
+
+catalog_worker = get_catalog_worker()
+# One catalog version for the whole script run, even if a refresh publishes meanwhile
+catalog = catalog_worker.current()
+# Sessions keep only the version they last saw; the catalog itself is shared
+if catalog and st.session_state.get('catalog_version') != catalog.version:
+    if st.session_state.get('catalog_version'):
+        st.toast("🆕 Catálogo actualizado con los últimos productos del sitio web")
+    st.session_state.catalog_version = catalog.version
+
+# Stream assistant replies token by token (set LAFIANCEE_STREAM=0 to disable)
+STREAM_REPLIES = os.getenv('LAFIANCEE_STREAM', '1') != '0'
+# Seconds between catalog status checks while a scan runs
+STATUS_POLL_INTERVAL = 2
+# Show the process metrics in the sidebar (set LAFIANCEE_ADMIN=1)
+SHOW_METRICS = os.getenv('LAFIANCEE_ADMIN', '0') == '1'
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def catalog_summary(version, _catalog):
+    """Markdown of the sidebar category counts and preview, built once per catalog version"""
+    categories = "\n".join(f"- {cat}: {count} productos" for cat, count in _catalog.category_counts)
+    preview = "\n\n".join(
+        f"**{i+1}. {p.name}**" + (f"  \n💰 {p.price}" if p.price else "")
+        for i, p in enumerate(_catalog.preview[:3])
+    )
+    return categories, preview
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def product_cards(version, _catalog):
+    """HTML of the showcase cards, built once per catalog version"""
+    cards = []
+    for product in _catalog.preview:
+        product_info = f"<div class='product-card'>"
+        product_info += f"<h4>💍 {product.name[:50]}</h4>"
+        if product.price:
+            product_info += f"<p><b>Precio:</b> {product.price} COP</p>"
+        if product.category:
+            product_info += f"<p><b>Categoría:</b> {product.category}</p>"
+        if product.material:
+            product_info += f"<p><b>Material:</b> {product.material}</p>"
+        if product.weight:
+            product_info += f"<p><b>Peso:</b> {product.weight}</p>"
+        if product.size:
+            product_info += f"<p><b>Tamaño:</b> {product.size}</p>"
+        product_info += "</div>"
+        cards.append(product_info)
+    return cards
+
+def render_reply(reply):
+    """Show a reply in the current chat message, token by token when streamed.
+
+    Returns the full text so it can be stored in the conversation history.
+    """
+    if isinstance(reply, str):
+        st.markdown(reply)
+        return reply
+    placeholder = st.empty()
+    text = ""
+    for chunk in reply:
+        text += chunk
+        placeholder.markdown(text + "▌")
+    placeholder.markdown(text)
+    return text
+
+def render_catalog_panel(catalog, polling=False):
+    """Scan status and catalog overview for the sidebar"""
+    scan_status = catalog_worker.status()
+    latest = catalog_worker.current()
+    if polling and (scan_status['state'] != 'scanning' or latest is not catalog):
+        # The scan ended or published a new catalog: rerun the page to show it
+        st.rerun()
+    if scan_status['state'] == 'scanning':
+        if scan_status['progress']:
+            done, total = scan_status['progress']
+            st.caption(f"⏳ Escaneando producto {done} de {total}...")
+        else:
+            st.caption("⏳ Escaneando lafianceejoyas.co...")
+    elif scan_status['state'] == 'error':
+        st.error(f"Error durante el escaneo: {scan_status['error']}")
+    if scan_status['changes']:
+        st.caption(
+            f"🆕 {scan_status['changes']['added']} nuevos, ✏️ {scan_status['changes']['updated']} actualizados, "
+            f"🗑️ {scan_status['changes']['removed']} retirados"
         )
-        
-        return response.choices[0].message.content
-    
-    except Exception as e:
-        return f"Lo siento, hay un problema técnico: {str(e)}. Por favor verifica tu API key de OpenAI o intenta nuevamente."
+    if scan_status['cache']:
+        st.caption(f"🗄️ Caché: {scan_status['cache']['hits']} páginas sin cambios, {scan_status['cache']['misses']} descargadas")
+    if scan_status['refreshed_at']:
+        st.caption(f"🕒 Actualizado: {datetime.fromtimestamp(scan_status['refreshed_at']).strftime('%Y-%m-%d %H:%M')}")
+
+    if catalog:
+        st.info(f"📦 {len(catalog.products)} productos reales en base de datos")
+        categories, preview = catalog_summary(catalog.version, catalog)
+
+        # Show categories
+        with st.expander("📋 Categorías"):
+            st.markdown(categories)
+
+        # Show sample products
+        with st.expander("👀 Vista previa de productos"):
+            st.markdown(preview)
+
+@st.fragment(run_every=STATUS_POLL_INTERVAL)
+def polling_catalog_panel(catalog):
+    """The catalog panel while a scan runs, refreshed on its own every few seconds"""
+    render_catalog_panel(catalog, polling=True)
+
+def render_metrics_panel():
+    """Latency percentiles and counters of this process, for operators"""
+    with st.expander("📊 Métricas"):
+        label = lambda name, labels: name + "".join(f" {k}={v}" for k, v in labels)
+        spans = sorted(metrics.registry.spans().items())
+        if spans:
+            st.markdown("\n".join(
+                f"- **{label(*key)}**: {s['count']} · p50 {s['p50'] * 1000:.0f} ms · p95 {s['p95'] * 1000:.0f} ms"
+                for key, s in spans
+            ))
+        counters = sorted(metrics.registry.counters().items())
+        if counters:
+            st.markdown("\n".join(f"- {label(*key)}: {value:g}" for key, value in counters))
+        if not spans and not counters:
+            st.caption("Aún no hay métricas")
+
+
+def answer(user_input, catalog):
+    """Show the user's message and stream the assistant's reply below it"""
+    st.session_state.messages.append({"role": "user", "content": user_input})
+    with st.chat_message("user"):
+        st.markdown(user_input)
+
+    # Get AI response
+    with st.chat_message("assistant"):
+        reply = None
+        try:
+            # The spinner only covers the wait for the first token
+            with st.spinner("Pensando..."):
+                reply = chat_with_openai(
+                    st.session_state.messages,
+                    st.session_state.openai_api_key,
+                    catalog,
+                    stream=STREAM_REPLIES,
+                    history=st.session_state.history
+                )
+            response = render_reply(reply)
+        finally:
+            # A rerun may interrupt the reply before it is read; free its upstream request
+            if hasattr(reply, 'close'):
+                reply.close()
+
+    st.session_state.messages.append({"role": "assistant", "content": response})
+
+@st.fragment
+def chat(catalog):
+    """Conversation so far, then the new message and its reply, all in one pass"""
+    # Display chat messages
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    # Handle quick messages from the sidebar, then typed ones
+    typed = st.chat_input("Escribe tu mensaje aquí...")
+    user_input = st.session_state.pop('quick_message', None) or typed
+    if user_input:
+        answer(user_input, catalog)
+
+@st.fragment
+def product_showcase(catalog):
+    """Footer with products showcase (no images, just text from REAL data)"""
+    st.markdown("---")
+    st.subheader("✨ Productos del Catálogo Real")
+
+    cols = st.columns(3)
+    for idx, (product, card) in enumerate(zip(catalog.preview, product_cards(catalog.version, catalog))):
+        with cols[idx % 3]:
+            st.markdown(card, unsafe_allow_html=True)
+
+            if st.button(f"Ver en sitio web", key=f"btn_{idx}"):
+                st.info(f"🔗 {product.url or 'URL no disponible'}")
 
 # Sidebar
 with st.sidebar:
@@ -396,32 +296,14 @@ with st.sidebar:
     # Scraping section
     st.subheader("🌐 Datos del Sitio Web")
     
-    if st.button("🔄 Escanear Sitio Web", use_container_width=True):
-        with st.spinner("Escaneando lafianceejoyas.co... Esto puede tomar unos minutos..."):
-            scraper = LaFianceeJoyasScraper()
-            success = scraper.scrape_homepage()
-            
-            if success:
-                st.session_state.scraped_data = scraper.data
-                st.success(f"✅ {len(scraper.data['products'])} productos encontrados del sitio web real")
-            else:
-                st.error("❌ Error al escanear el sitio")
+    if st.button("🔄 Actualizar catálogo", use_container_width=True):
+        if catalog_worker.trigger():
+            st.info("🔄 Actualización iniciada en segundo plano, puedes seguir chateando")
     
-    if st.session_state.scraped_data:
-        st.info(f"📦 {len(st.session_state.scraped_data['products'])} productos reales en base de datos")
-        
-        # Show categories
-        with st.expander("📋 Categorías"):
-            for cat in st.session_state.scraped_data['categories']:
-                count = len([p for p in st.session_state.scraped_data['products'] if p.get('category') == cat])
-                st.write(f"• {cat}: {count} productos")
-        
-        # Show sample products
-        with st.expander("👀 Vista previa de productos"):
-            for i, p in enumerate(st.session_state.scraped_data['products'][:3]):
-                st.write(f"**{i+1}. {p['name']}**")
-                if p.get('price'):
-                    st.write(f"   💰 {p['price']}")
+    if catalog_worker.status()['state'] == 'scanning':
+        polling_catalog_panel(catalog)
+    else:
+        render_catalog_panel(catalog)
     
     st.markdown("---")
     
@@ -448,10 +330,15 @@ with st.sidebar:
     
     if st.button("🧹 Limpiar Chat", use_container_width=True):
         st.session_state.messages = []
+        st.session_state.history.reset()
         st.rerun()
     
     st.markdown("---")
     
+    if SHOW_METRICS:
+        render_metrics_panel()
+        st.markdown("---")
+    
     # Info
     st.markdown("""
         <div style="background: white; padding: 10px; border-radius: 10px; font-size: 12px; color: #000000;">
@@ -475,11 +362,19 @@ if not st.session_state.openai_api_key:
     st.warning("⚠️ Por favor ingresa tu API Key de OpenAI en la barra lateral para comenzar.")
     st.stop()
 
-# Check if data has been scraped - NO HARDCODED DATA
-if not st.session_state.scraped_data:
-    st.warning("⚠️ **IMPORTANTE:** Debes escanear el sitio web primero para obtener datos reales.")
-    st.info("👉 Presiona el botón '🔄 Escanear Sitio Web' en la barra lateral para cargar productos, precios y detalles directamente de lafianceejoyas.co")
-    st.info("⏱️ El escaneo toma 1-2 minutos y cargará todos los productos disponibles del sitio web real.")
+# Wait for the first catalog - NO HARDCODED DATA
+if not catalog:
+    scan_status = catalog_worker.status()
+    if scan_status['state'] == 'scanning':
+        st.info("⏳ Cargando productos, precios y detalles directamente de lafianceejoyas.co...")
+        if scan_status['progress']:
+            done, total = scan_status['progress']
+            st.progress(done / max(total, 1), text=f"Escaneando producto {done} de {total}...")
+        # The sidebar panel polls the scan and reruns the page once it ends;
+        # later refreshes never block the chat
+        st.stop()
+    st.warning("⚠️ **IMPORTANTE:** Aún no hay datos del sitio web.")
+    st.info("👉 Presiona el botón '🔄 Actualizar catálogo' en la barra lateral para cargar productos, precios y detalles directamente de lafianceejoyas.co")
     st.stop()
 
 # Initialize chat with welcome message
@@ -489,77 +384,7 @@ if not st.session_state.messages:
         "content": "¡Hola! 👋 Bienvenido a La Fiancee Joyas. Soy tu asesor personal de joyas en oro 18K.\n\n¿En qué puedo ayudarte hoy? Ya sea para un compromiso, boda, aniversario o un regalo especial, estoy aquí para ayudarte a encontrar la joya perfecta. 😊\n\nTengo información actualizada de todos nuestros productos disponibles en el sitio web."
     }]
 
-# Display chat messages
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-# Handle quick messages
-if 'quick_message' in st.session_state:
-    user_input = st.session_state.quick_message
-    del st.session_state.quick_message
-    
-    # Add user message
-    st.session_state.messages.append({"role": "user", "content": user_input})
-    with st.chat_message("user"):
-        st.markdown(user_input)
-    
-    # Get AI response
-    with st.chat_message("assistant"):
-        with st.spinner("Pensando..."):
-            response = chat_with_openai(
-                st.session_state.messages,
-                st.session_state.openai_api_key,
-                st.session_state.scraped_data
-            )
-            st.markdown(response)
-    
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.rerun()
-
-# Chat input
-if user_input := st.chat_input("Escribe tu mensaje aquí..."):
-    # Add user message
-    st.session_state.messages.append({"role": "user", "content": user_input})
-    with st.chat_message("user"):
-        st.markdown(user_input)
-    
-    # Get AI response
-    with st.chat_message("assistant"):
-        with st.spinner("Pensando..."):
-            response = chat_with_openai(
-                st.session_state.messages,
-                st.session_state.openai_api_key,
-                st.session_state.scraped_data
-            )
-            st.markdown(response)
-    
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.rerun()
+chat(catalog)
 
-# Footer with products showcase (no images, just text from REAL data)
-if st.session_state.scraped_data and st.session_state.scraped_data['products']:
-    st.markdown("---")
-    st.subheader("✨ Productos del Catálogo Real")
-    
-    cols = st.columns(3)
-    for idx, product in enumerate(st.session_state.scraped_data['products'][:9]):
-        with cols[idx % 3]:
-            product_info = f"<div class='product-card'>"
-            product_info += f"<h4>💍 {product['name'][:50]}</h4>"
-            if product.get('price'):
-                product_info += f"<p><b>Precio:</b> {product['price']} COP</p>"
-            if product.get('category'):
-                product_info += f"<p><b>Categoría:</b> {product['category']}</p>"
-            if product.get('material'):
-                product_info += f"<p><b>Material:</b> {product['material']}</p>"
-            if product.get('weight'):
-                product_info += f"<p><b>Peso:</b> {product['weight']}</p>"
-            if product.get('size'):
-                product_info += f"<p><b>Tamaño:</b> {product['size']}</p>"
-            product_info += "</div>"
-            
-            st.markdown(product_info, unsafe_allow_html=True)
-            
-            if st.button(f"Ver en sitio web", key=f"btn_{idx}"):
-                st.info(f"🔗 {product.get('url', 'URL no disponible')}")
\ No newline at end of file
+if catalog.products:
+    product_showcase(catalog)
@@ -0,0 +1,454 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+import prompt_encoding
+from facets import FacetIndex, MAX_SEARCH_LIMIT, SEARCH_LIMIT, SORTS
+from history import count_tokens, message_tokens
+from llm_client import DeadlineExceeded, LLMClient, record_tokens, retryable
+from product_parser import CATEGORY_LABELS, MATERIAL_LABELS
+from response_cache import ReplyCache
+from retrieval import ProductIndex, select_products
+
+MODEL = "gpt-4o-mini"
+# Catalog versions whose prompt and search index stay memoized
+MAX_VERSIONS = 4
+# How long a session waits for an identical in-flight request before asking itself
+COALESCE_TIMEOUT = 60
+# Products retrieved into the prompt each turn; anything more specific
+# goes through the search_products tool
+RELEVANT_PRODUCTS = 6
+# Tool calls answered per reply before the model must answer with what it has
+MAX_TOOL_ROUNDS = 3
+
+# Replies shared by every session of this process
+reply_cache = ReplyCache()
+
+_lock = threading.Lock()
+_clients = {}
+_by_version = OrderedDict()
+
+log = logging.getLogger(__name__)
+
+
+def get_client(api_key):
+    """Return the process-wide LLMClient for an API key.
+
+    Reusing one client keeps its HTTP connection pool (and TLS sessions)
+    alive across turns and browser sessions.
+    """
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            from openai import OpenAI
+
+            client = LLMClient(OpenAI(api_key=api_key, max_retries=0))
+            _clients[api_key] = client
+        return client
+
+
+def _memoized(version, name, build):
+    """Cache build() under (version, name), keeping the MAX_VERSIONS newest catalogs"""
+    with _lock:
+        entry = _by_version.get(version)
+        if entry is not None and name in entry:
+            _by_version.move_to_end(version)
+            return entry[name]
+    value = build()
+    with _lock:
+        entry = _by_version.setdefault(version, {})
+        entry.setdefault(name, value)
+        _by_version.move_to_end(version)
+        while len(_by_version) > MAX_VERSIONS:
+            _by_version.popitem(last=False)
+        return entry[name]
+
+
+def get_search_index(knowledge_base):
+    """Product search index, built once per catalog version"""
+    return _memoized(
+        knowledge_base.version, 'index',
+        lambda: ProductIndex(knowledge_base.products)
+    )
+
+
+def get_facet_index(knowledge_base):
+    """Typed facet index for search_products, built once per catalog version"""
+    return _memoized(
+        knowledge_base.version, 'facets',
+        lambda: FacetIndex(knowledge_base.products)
+    )
+
+
+def get_system_prompt(knowledge_base):
+    """Rendered system prompt, built once per catalog version.
+
+    It holds no per-turn content, so the same prefix is sent every turn and
+    provider-side prompt caching can apply to it.
+    """
+    return _memoized(
+        knowledge_base.version, 'system_prompt',
+        lambda: render_system_prompt(knowledge_base)
+    )
+
+
+def get_base_url(knowledge_base):
+    """Store URL product handles are relative to, found once per catalog version"""
+    return _memoized(
+        knowledge_base.version, 'base_url',
+        lambda: prompt_encoding.base_url(knowledge_base.products)
+    )
+
+
+def format_products(products, knowledge_base):
+    """Products as a compact table for the prompt; the legend is in the system prompt"""
+    return prompt_encoding.encode_products(products, get_base_url(knowledge_base))
+
+
+def render_system_prompt(knowledge_base):
+    """Enhanced system prompt for conversational AI"""
+    return f"""Eres un asesor experto y amigable de La Fiancee Joyas, una joyería colombiana especializada en oro 18K italiano de alta calidad.
+
+INFORMACIÓN DE LA EMPRESA:
+- Nombre: La Fiancee Joyas
+- Especialidad: Joyas en Oro 18K (amarillo, blanco, rosa y tres oros)
+- Productos: Cadenas, pulseras, aretes, anillos y dijes
+- Moneda: Pesos colombianos (COP)
+- Sitio web: lafianceejoyas.co
+- Instagram: @lafianceejoyas
+
+CATÁLOGO (EXTRAÍDO DEL SITIO WEB REAL):
+- {len(knowledge_base.products)} productos en total
+- Antes de cada mensaje del cliente recibirás algunos PRODUCTOS DEL CATÁLOGO RELEVANTES PARA ESTA CONVERSACIÓN, con nombre, precio, categoría, material y URL
+- Para presupuestos, materiales, categorías, pesos o tamaños concretos usa la herramienta search_products: filtra el catálogo completo y sus precios son exactos
+
+FORMATO DE LOS PRODUCTOS:
+{prompt_encoding.legend(get_base_url(knowledge_base))}
+- Al cliente dale siempre el enlace completo y los precios con formato, por ejemplo $1.250.000 COP
+
+CATEGORÍAS DISPONIBLES:
+{', '.join(knowledge_base.categories)}
+
+TU ROL Y PERSONALIDAD:
+- Eres un asesor experto pero cercano y conversacional
+- Entiendes las ocasiones especiales (bodas, aniversarios, regalos, compromiso)
+- Haces preguntas para entender mejor las necesidades del cliente
+- Das recomendaciones personalizadas basadas en el presupuesto y ocasión
+- Usas emojis moderadamente para ser más cálido
+- Hablas de manera natural, no como un robot
+
+CÓMO RESPONDER SEGÚN LA OCASIÓN:
+1. **Para Compromiso/Boda**: Recomienda anillos elegantes del catálogo real, menciona la importancia del oro 18K para una pieza tan especial
+2. **Para Regalo de Novia/Esposa**: Sugiere cadenas, pulseras o aretes del catálogo según estilo (clásico, moderno)
+3. **Para Uso Diario**: Recomienda piezas versátiles y duraderas del inventario
+4. **Para Ocasión Especial**: Piezas más llamativas o con diseños únicos que tengamos en stock
+
+REGLAS CRÍTICAS:
+- SOLO menciona productos que estén en la lista de productos relevantes o en los resultados de search_products
+- Esa lista es solo una selección del catálogo: si el cliente busca algo que no aparece, búscalo con search_products antes de pedirle más detalles (tipo de joya, material, presupuesto) o invitarlo a ver lafianceejoyas.co
+- SIEMPRE usa los precios exactos del catálogo (si están disponibles)
+- Si un precio no está disponible, di "Consultar precio en lafianceejoyas.co o Instagram @lafianceejoyas"
+- Incluye el link del producto cuando sea relevante
+- NO inventes productos, precios o características que no estén en el catálogo
+- Si el cliente pregunta por algo que no tenemos, sugiere alternativas REALES del catálogo
+- Sé conversacional: "¡Qué emoción! Para un compromiso te recomendaría..." en lugar de respuestas secas
+
+PREGUNTAS QUE PUEDES HACER:
+- ¿Para qué ocasión es la joya?
+- ¿Qué estilo prefiere? (clásico, moderno, minimalista)
+- ¿Tienes algún presupuesto en mente?
+- ¿Prefiere oro amarillo, blanco o rosa?
+- ¿Es para uso diario o ocasiones especiales?
+
+INFORMACIÓN ADICIONAL:
+- Garantía: Todas las joyas son 100% oro 18K italiano con certificado
+- Envíos: Sí, a toda Colombia (consultar detalles por Instagram)
+- Cuidado: Evitar químicos, guardar en lugar seco, limpiar con paño suave
+- Personalización: Consultar disponibilidad por Instagram @lafianceejoyas
+- Tienda física: Contactar por Instagram para ubicación"""
+
+
+SUMMARY_PROMPT = """Resumes conversaciones entre un cliente y el asesor de La Fiancee Joyas.
+Actualiza el resumen actual con los nuevos mensajes. Conserva la ocasión, el presupuesto, las preferencias
+(material, estilo, tallas), los productos recomendados con su precio y las preguntas pendientes del cliente.
+Escribe en español, en viñetas breves, con un máximo de 150 palabras."""
+
+
+def conversation_summarizer(api_key):
+    """Return a summarize(summary, messages) callable for ConversationHistory"""
+    def summarize(summary, messages):
+        transcript = "\n".join(
+            f"{'Cliente' if m['role'] == 'user' else 'Asesor'}: {m['content']}" for m in messages
+        )
+        response = get_client(api_key).create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"RESUMEN ACTUAL:\n{summary or '(vacío)'}\n\nNUEVOS MENSAJES:\n{transcript}"},
+            ],
+            temperature=0.2,
+            max_tokens=300
+        )
+        return response.choices[0].message.content.strip()
+    return summarize
+
+
+SEARCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "search_products",
+        "description": (
+            "Busca en el catálogo completo de La Fiancee Joyas. Combina texto libre con filtros por categoría, "
+            "material y rangos de precio (COP), peso (gramos) y tamaño (milímetros; 50 cm = 500 mm). "
+            "Devuelve cuántos productos coinciden y los primeros resultados."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Texto libre que ordena por relevancia, p. ej. 'corazón' o 'virgen milagrosa'; no descarta productos"},
+                "category": {"type": "string", "enum": list(CATEGORY_LABELS)},
+                "material": {"type": "string", "enum": list(MATERIAL_LABELS)},
+                "min_price_cop": {"type": "integer"},
+                "max_price_cop": {"type": "integer", "description": "Presupuesto máximo; 2 millones = 2000000"},
+                "min_weight_g": {"type": "number"},
+                "max_weight_g": {"type": "number"},
+                "min_size_mm": {"type": "number"},
+                "max_size_mm": {"type": "number"},
+                "sort": {"type": "string", "enum": list(SORTS)},
+                "limit": {"type": "integer", "minimum": 1, "maximum": MAX_SEARCH_LIMIT},
+            },
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def search_products(knowledge_base, query=None, category=None, material=None,
+                    min_price_cop=None, max_price_cop=None, min_weight_g=None, max_weight_g=None,
+                    min_size_mm=None, max_size_mm=None, sort=None, limit=SEARCH_LIMIT):
+    """Run a search_products tool call; returns the text handed back to the model"""
+    total, products = get_facet_index(knowledge_base).search(
+        category=category,
+        material=material,
+        ranges=[
+            ('price_cop', min_price_cop, max_price_cop),
+            ('weight_g', min_weight_g, max_weight_g),
+            ('size_mm', min_size_mm, max_size_mm),
+        ],
+        query=query,
+        text_index=get_search_index(knowledge_base),
+        sort=sort,
+        limit=max(1, min(int(limit or SEARCH_LIMIT), MAX_SEARCH_LIMIT)),
+    )
+    if not products:
+        return "Ningún producto del catálogo coincide con esa búsqueda."
+    return f"{total} productos coinciden; se muestran {len(products)}:\n{format_products(products, knowledge_base)}"
+
+
+def run_tool_call(call, knowledge_base):
+    """Result text of one tool call; errors are reported to the model rather than raised"""
+    try:
+        if call['function']['name'] != 'search_products':
+            return f"Herramienta desconocida: {call['function']['name']}"
+        arguments = json.loads(call['function']['arguments'] or '{}')
+        return search_products(knowledge_base, **arguments)
+    except Exception as e:
+        return f"Error en la búsqueda: {e}"
+
+
+def tool_messages(tool_calls, knowledge_base):
+    """The assistant's tool call message followed by one result message per call"""
+    return [{"role": "assistant", "content": None, "tool_calls": tool_calls}] + [
+        {"role": "tool", "tool_call_id": call['id'], "content": run_tool_call(call, knowledge_base)}
+        for call in tool_calls
+    ]
+
+
+def build_messages(messages, knowledge_base, conversation=None):
+    """Assemble the API messages for a turn; conversation, if given, is sent in place of messages"""
+    with metrics.span('prompt_build'):
+        # Retrieval still looks at the full messages
+        relevant_products = select_products(get_search_index(knowledge_base), messages, k=RELEVANT_PRODUCTS)
+        products_catalog = format_products(relevant_products, knowledge_base)
+    if conversation is None:
+        conversation = messages
+    products_message = {
+        "role": "system",
+        "content": (
+            f"PRODUCTOS DEL CATÁLOGO RELEVANTES PARA ESTA CONVERSACIÓN "
+            f"({len(relevant_products)} de {len(knowledge_base.products)}):\n{products_catalog}"
+        ),
+    }
+    # System prompt and conversation form a prefix that only grows between turns;
+    # this turn's products go right before the newest user message
+    return (
+        [{"role": "system", "content": get_system_prompt(knowledge_base)}]
+        + conversation[:-1] + [products_message] + conversation[-1:]
+    )
+
+
+# OpenAI Chat Function
+def chat_with_openai(messages, api_key, knowledge_base, stream=False, history=None):
+    """Chat with OpenAI API with enhanced conversational abilities"""
+    # Identical conversations on the same catalog share one reply, and one upstream call while in flight
+    key = reply_cache.key(knowledge_base.version, messages)
+    reply, pending, leader = reply_cache.begin(key)
+    if reply is None and not leader:
+        try:
+            reply = pending.result(timeout=COALESCE_TIMEOUT)
+        except Exception:
+            reply = None
+    if reply is not None:
+        metrics.count('reply_cache', result='coalesced' if pending else 'hit')
+        return reply
+    metrics.count('reply_cache', result='miss')
+
+    finish = (lambda text: reply_cache.finish(key, pending, text)) if leader else (lambda text: None)
+    start = time.perf_counter()
+    try:
+        reply = request_completion(messages, api_key, knowledge_base, stream, history)
+        if stream:
+            # The caller must close() it; cached replies above are plain strings
+            reply.finish, reply.start = finish, start
+            return reply
+        metrics.observe('reply', time.perf_counter() - start, stream=False)
+        finish(reply)
+        return reply
+
+    except Exception as e:
+        finish(None)
+        metrics.count('reply_errors')
+        log.error("Error in chat completion", extra={'error': str(e)})
+        error = error_reply(e)
+        return iter([error]) if stream else error
+
+
+def error_reply(error):
+    """The reply shown in place of an answer that failed with error"""
+    if isinstance(error, DeadlineExceeded) or retryable(error):
+        return "Lo siento, en este momento tenemos muchas consultas y no alcancé a responder. Por favor intenta nuevamente en unos segundos. 🙏"
+    return f"Lo siento, hay un problema técnico: {str(error)}. Por favor verifica tu API key de OpenAI o intenta nuevamente."
+
+
+def request_completion(messages, api_key, knowledge_base, stream=False, history=None):
+    """Reply to the conversation: its text, or a StreamedReply with stream=True.
+
+    The first request is sent before returning either way, so connection
+    and authentication errors are raised here.
+    """
+    client = get_client(api_key)
+    # The session's ConversationHistory keeps long chats within the token budget
+    conversation = history.compact(messages, conversation_summarizer(api_key)) if history else None
+    api_messages = build_messages(messages, knowledge_base, conversation)
+    response = create_completion(client, api_messages, stream)
+    if stream:
+        return StreamedReply(stream_completion(client, api_messages, knowledge_base, response), response)
+    return complete(client, api_messages, knowledge_base, response)
+
+
+def create_completion(client, api_messages, stream=False, tools=True):
+    """Send one chat completion request, offering search_products unless tools is False"""
+    # Call OpenAI API
+    return client.create(
+        model=MODEL,
+        messages=api_messages,
+        temperature=0.8,
+        max_tokens=800,
+        stream=stream,
+        **({"tools": [SEARCH_TOOL]} if tools else {})
+    )
+
+
+def complete(client, api_messages, knowledge_base, response):
+    """Final reply text, answering the tool calls of response and the ones after it"""
+    for step in range(1, MAX_TOOL_ROUNDS + 2):
+        message = response.choices[0].message
+        if not message.tool_calls:
+            return message.content
+        calls = [
+            {"id": c.id, "type": "function", "function": {"name": c.function.name, "arguments": c.function.arguments}}
+            for c in message.tool_calls
+        ]
+        api_messages = api_messages + tool_messages(calls, knowledge_base)
+        response = create_completion(client, api_messages, tools=step < MAX_TOOL_ROUNDS)
+    return response.choices[0].message.content
+
+
+def stream_completion(client, api_messages, knowledge_base, response):
+    """Yield the reply's text deltas, answering tool calls between streamed rounds"""
+    for step in range(1, MAX_TOOL_ROUNDS + 2):
+        calls = {}
+        model, completion_tokens = MODEL, 0
+        try:
+            for chunk in response:
+                model = chunk.model or model
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    completion_tokens += count_tokens(delta.content)
+                    yield delta.content
+                # Tool calls arrive in fragments: the id and name first, then the arguments
+                for part in delta.tool_calls or []:
+                    call = calls.setdefault(part.index, {
+                        "id": None, "type": "function", "function": {"name": "", "arguments": ""}
+                    })
+                    if part.id:
+                        call['id'] = part.id
+                    if part.function and part.function.name:
+                        call['function']['name'] += part.function.name
+                    if part.function and part.function.arguments:
+                        call['function']['arguments'] += part.function.arguments
+        finally:
+            response.close()
+        # Streamed responses carry no usage; count a local estimate instead
+        record_tokens(model, sum(message_tokens(m) for m in api_messages), completion_tokens, estimated=True)
+        if not calls:
+            return
+        api_messages = api_messages + tool_messages([calls[i] for i in sorted(calls)], knowledge_base)
+        response = create_completion(client, api_messages, stream=True, tools=step < MAX_TOOL_ROUNDS)
+
+
+class StreamedReply:
+    """Text chunks of a streamed reply; close() frees its upstream request even if never read"""
+
+    def __init__(self, chunks, response, finish=None, start=None):
+        # Called once with the full text, or None if the stream fails or is abandoned
+        self.finish = finish
+        # time.perf_counter() of the request, for the first-token and reply latencies
+        self.start = start
+        self._chunks = chunks
+        self._response = response
+
+    def __iter__(self):
+        parts = []
+        completed = False
+        try:
+            for text in self._chunks:
+                if self.start is not None and not parts:
+                    metrics.observe('reply_first_token', time.perf_counter() - self.start)
+                parts.append(text)
+                yield text
+            completed = True
+            if self.start is not None:
+                metrics.observe('reply', time.perf_counter() - self.start, stream=True)
+        except Exception as e:
+            yield f"\n\nLo siento, la respuesta se interrumpió: {str(e)}. Por favor intenta nuevamente."
+        finally:
+            self._settle("".join(parts) if completed else None)
+            self.close()
+
+    def close(self):
+        # Must be called by callers a Streamlit rerun may interrupt
+        self._chunks.close()
+        self._response.close()
+        # Closed before the end: waiters on this reply must not wait for it
+        self._settle(None)
+
+    def _settle(self, text):
+        finish, self.finish = self.finish, None
+        if finish:
+            finish(text)
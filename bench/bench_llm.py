@@ -0,0 +1,79 @@
+"""Exercise llm_client against the fake OpenAI server with injected faults.
+
+    python -m bench.bench_llm --requests 200
+
+Scenarios: transient 503s (retries), a slow tail (with and without
+hedging), a main model answering 429 (fallback) and an upstream slower
+than the deadline. Reports success rate, latency percentiles and how many
+upstream requests each scenario cost.
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_client
+from bench.fake_openai import serve
+
+MESSAGES = [{"role": "user", "content": "Busco un anillo de compromiso"}]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else None
+
+
+def run(label, n_requests, concurrency, client_options, **fake_options):
+    from openai import OpenAI
+
+    # Latency history and overload state are per process; each scenario starts clean
+    llm_client.latency = llm_client.LatencyTracker()
+    llm_client.overload = llm_client.OverloadTracker()
+    server, fake, base_url = serve(seed=0, **fake_options)
+    client = llm_client.LLMClient(OpenAI(api_key='test', base_url=base_url, max_retries=0), **client_options)
+
+    def call(_):
+        start = time.perf_counter()
+        try:
+            response = client.create(model='gpt-4o-mini', messages=MESSAGES, max_tokens=50)
+            return time.perf_counter() - start, response.model, None
+        except Exception as e:
+            return time.perf_counter() - start, None, type(e).__name__
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, range(n_requests)))
+    server.shutdown()
+
+    latencies = [seconds * 1000 for seconds, _, error in results if error is None]
+    return {
+        'scenario': label,
+        'ok': len(latencies),
+        'errors': dict(Counter(error for _, _, error in results if error)),
+        'models': dict(Counter(model for _, model, _ in results if model)),
+        'upstream_requests': len(fake.requests),
+        'p50_ms': round(statistics.median(latencies)) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99)) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+    n, c = args.requests, args.concurrency
+    fast = dict(backoff=0.05)
+
+    print(run('no retries, 10% 503', n, c, dict(fast, max_retries=0), first_token_delay=0.02, error_rate=0.1))
+    print(run('retries, 10% 503', n, c, fast, first_token_delay=0.02, error_rate=0.1))
+    print(run('slow tail, no hedge', n, c, fast, first_token_delay=0.02, slow_rate=0.03, slow_delay=1.0))
+    print(run('slow tail, hedged', n, c, dict(fast, hedge=True),
+              first_token_delay=0.02, slow_rate=0.03, slow_delay=1.0))
+    print(run('main model 429, fallback', n, c, dict(fast, fallback_model='fallback-model'),
+              first_token_delay=0.02, error_rate=1.0, error_status=429, error_models={'gpt-4o-mini'}))
+    print(run('upstream slower than deadline', 8, c, dict(fast, deadline=0.5), first_token_delay=2.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Benchmark product page parsing: legacy full-soup parser vs product_parser.
+
+    python -m bench.bench_parser --products 200
+    python -m bench.bench_parser --pages saved_pages/
+
+Pages are rendered by the fake store (with and without JSON-LD / og: meta)
+from a synthetic catalog, or read from a directory of saved .html pages.
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+import product_parser
+from bench.fake_store import FakeStore
+from bench.synthetic import synthetic_catalog
+
+
+def legacy_parse_product_page(content, url):
+    """The parser product_parser replaced, kept verbatim for comparison"""
+    soup = BeautifulSoup(content, 'html.parser')
+    product = {}
+    title_elem = soup.find('h1', class_='product-title')
+    if not title_elem:
+        title_elem = soup.find('h1')
+    product['name'] = title_elem.text.strip() if title_elem else url.split('/')[-1].replace('-', ' ').title()
+    price_elem = (
+        soup.find('span', class_='money') or
+        soup.find('span', {'data-product-price': True}) or
+        soup.find('span', class_='price') or
+        soup.find('div', class_='product-price')
+    )
+    if price_elem:
+        price_match = re.search(r'[\d,.]+', price_elem.text.strip().replace('.', '').replace(',', ''))
+        if price_match:
+            product['price'] = f"${price_match.group()}"
+    desc_elem = (
+        soup.find('div', class_='product-description') or
+        soup.find('div', {'itemprop': 'description'}) or
+        soup.find('div', class_='description')
+    )
+    if desc_elem:
+        product['description'] = desc_elem.text.strip()[:500]
+
+    full_text = product.get('description', '') + ' ' + product['name']
+    text_lower = full_text.lower()
+    if 'oro amarillo' in text_lower:
+        product['material'] = 'Oro Amarillo 18K'
+    elif 'oro blanco' in text_lower:
+        product['material'] = 'Oro Blanco 18K'
+    elif 'oro rosa' in text_lower or 'oro rosado' in text_lower:
+        product['material'] = 'Oro Rosa 18K'
+    elif 'tres oros' in text_lower or '3 oros' in text_lower:
+        product['material'] = 'Tres Oros 18K'
+    else:
+        product['material'] = 'Oro 18K'
+    weight_match = re.search(r'(\d+[,.]?\d*)\s*gr', full_text.lower())
+    product['weight'] = weight_match.group(1) + 'gr' if weight_match else None
+    size_match = re.search(r'(\d+)\s*cm', full_text.lower()) or re.search(r'(\d+)\s*mm', full_text.lower())
+    product['size'] = size_match.group(1) + size_match.group(0)[-2:] if size_match else None
+    name_lower = product['name'].lower()
+    if 'cadena' in name_lower:
+        product['category'] = 'Cadenas'
+    elif 'pulso' in name_lower or 'pulsera' in name_lower or 'brazalete' in name_lower:
+        product['category'] = 'Pulseras'
+    elif 'topo' in name_lower or 'arete' in name_lower or 'pendiente' in name_lower:
+        product['category'] = 'Aretes'
+    elif 'anillo' in name_lower or 'argolla' in name_lower:
+        product['category'] = 'Anillos'
+    elif 'dije' in name_lower or 'colgante' in name_lower or 'medalla' in name_lower:
+        product['category'] = 'Dijes'
+    else:
+        product['category'] = 'Joyas'
+    product['url'] = url
+    return product
+
+
+def rendered_pages(n_products, structured_data):
+    store = FakeStore(synthetic_catalog(n_products), structured_data=structured_data)
+    return [
+        (store.product_html(p).encode('utf-8'), f"https://lafianceejoyas.co/products/{p['handle']}")
+        for p in store.catalog['products']
+    ]
+
+
+def saved_pages(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                pages.append((f.read(), f"https://lafianceejoyas.co/products/{name[:-5]}"))
+    return pages
+
+
+def same_product(a, b):
+    """Equal up to whitespace: JSON-LD descriptions put a space between paragraphs"""
+    squash = lambda p: {k: ''.join(v.split()) if isinstance(v, str) else v for k, v in p.items()}
+    return squash(a) == squash(b)
+
+
+def time_parser(parse, pages, repeat):
+    timings = []
+    for _ in range(repeat):
+        for content, url in pages:
+            start = time.perf_counter()
+            parse(content, url)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+
+def run(label, pages, repeat=3):
+    legacy = [legacy_parse_product_page(c, u) for c, u in pages]
+    fast = [product_parser.parse_product_page(c, u) for c, u in pages]
+    legacy_p50, legacy_p95 = time_parser(legacy_parse_product_page, pages, repeat)
+    fast_p50, fast_p95 = time_parser(product_parser.parse_product_page, pages, repeat)
+    return {
+        'pages': label,
+        'count': len(pages),
+        'parser': product_parser.PARSER,
+        'same_output': sum(same_product(a, b) for a, b in zip(legacy, fast)),
+        'legacy_p50_ms': round(legacy_p50, 3),
+        'legacy_p95_ms': round(legacy_p95, 3),
+        'fast_p50_ms': round(fast_p50, 3),
+        'fast_p95_ms': round(fast_p95, 3),
+        'speedup': round(legacy_p50 / fast_p50, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--pages', help='Directory of saved product pages (*.html)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    if args.pages:
+        print(run(args.pages, saved_pages(args.pages), args.repeat))
+        return
+    print(run('structured', rendered_pages(args.products, True), args.repeat))
+    print(run('fallback', rendered_pages(args.products, False), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
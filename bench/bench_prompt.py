@@ -0,0 +1,84 @@
+"""Measure prompt tokens of the labelled product lines vs the compact table.
+
+    python -m bench.bench_prompt --products 2000
+
+Compares the product block of every turn (the RELEVANT_PRODUCTS retrieved
+for each query) and of whole-catalog dumps, on the store fixture and on a
+synthetic catalog. The table legend is paid once in the system prompt and
+reported separately. Tokens are estimated with history.count_tokens.
+"""
+import argparse
+
+import prompt_encoding
+from assistant import RELEVANT_PRODUCTS
+from bench.bench_retrieval import HISTORY, QUERIES
+from bench.fake_store import load_fixture
+from bench.synthetic import synthetic_products
+from catalog import Product
+from history import count_tokens
+from retrieval import ProductIndex, select_products
+from scraper import LaFianceeJoyasScraper
+
+
+def legacy_format_product(p):
+    """The per-product line prompt_encoding replaced, kept verbatim for comparison"""
+    product_str = f"- {p.name}"
+    if p.price:
+        product_str += f" - Precio: {p.price} COP"
+    if p.category:
+        product_str += f" - Categoría: {p.category}"
+    if p.material:
+        product_str += f" - Material: {p.material}"
+    if p.weight:
+        product_str += f" - Peso: {p.weight}"
+    if p.size:
+        product_str += f" - Tamaño: {p.size}"
+    if p.description:
+        product_str += f" - Descripción: {p.description[:100]}"
+    if p.url:
+        product_str += f" - URL: {p.url}"
+    return product_str
+
+
+def fixture_products():
+    scraper = LaFianceeJoyasScraper(cache_path=None)
+    return [Product.from_dict(scraper.parse_product_json(item)) for item in load_fixture()['products']]
+
+
+def compare(selections, base):
+    legacy = sum(count_tokens('\n'.join(legacy_format_product(p) for p in products)) for products in selections)
+    compact = sum(count_tokens(prompt_encoding.encode_products(products, base)) for products in selections)
+    return {
+        'blocks': len(selections),
+        'legacy_tokens': legacy,
+        'compact_tokens': compact,
+        'saved': f"{1 - compact / legacy:.0%}" if legacy else None,
+    }
+
+
+def run(label, products):
+    base = prompt_encoding.base_url(products)
+    index = ProductIndex(products)
+    turns = [
+        select_products(index, [{'role': 'user', 'content': t} for t in [*HISTORY, query]], k=RELEVANT_PRODUCTS)
+        for query in QUERIES
+    ]
+    return {
+        'catalog': label,
+        'products': len(products),
+        'legend_tokens': count_tokens(prompt_encoding.legend(base)),
+        'per_turn': compare(turns, base),
+        'full_dump': compare([products], base),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    args = parser.parse_args()
+    print(run('fixture', fixture_products()))
+    print(run('synthetic', synthetic_products(args.products)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark ProductIndex and FacetIndex build and query latency on synthetic catalogs.
+
+    python -m bench.bench_retrieval --products 10000
+"""
+import argparse
+import statistics
+import time
+
+from facets import FacetIndex
+from retrieval import ProductIndex, select_products
+from bench.synthetic import synthetic_products
+
+QUERIES = [
+    "Quiero comprar un anillo de compromiso para mi novia",
+    "Busco un regalo especial para mi esposa",
+    "Necesito unas argollas de matrimonio",
+    "cadenas en oro blanco de 50 cm",
+    "¿Tienen dijes de la Virgen Milagrosa?",
+    "pulseras tejidas tres oros",
+    "topos de corazón en oro rosado para niña",
+    "¿Hacen envíos? ¿Cuánto demora?",
+]
+HISTORY = ["Hola, busco algo para un aniversario", "Ella prefiere el oro blanco"]
+# search_products calls: facet filters, ranges and a text query with a price sort
+FACET_QUERIES = [
+    dict(category='Anillos', material='Oro Blanco 18K', ranges=[('price_cop', None, 2_000_000)]),
+    dict(category='Cadenas', ranges=[('size_mm', 450, 500), ('weight_g', 3, None)]),
+    dict(ranges=[('price_cop', 1_000_000, 3_000_000)], sort='price_desc'),
+    dict(query='topos corazón', material='Oro Rosa 18K', sort='price_asc'),
+]
+
+
+def run(n_products, repeat=200):
+    products = synthetic_products(n_products)
+
+    start = time.perf_counter()
+    index = ProductIndex(products)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            messages = [{'role': 'user', 'content': h} for h in HISTORY + [query]]
+            start = time.perf_counter()
+            select_products(index, messages)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    start = time.perf_counter()
+    facets = FacetIndex(products)
+    facet_build_ms = (time.perf_counter() - start) * 1000
+
+    facet_timings = []
+    for _ in range(repeat // 4):
+        for query in FACET_QUERIES:
+            start = time.perf_counter()
+            facets.search(text_index=index, **query)
+            facet_timings.append((time.perf_counter() - start) * 1000)
+    facet_timings.sort()
+    return {
+        'products': n_products,
+        'build_ms': round(build_ms, 1),
+        'query_p50_ms': round(statistics.median(timings), 4),
+        'query_p95_ms': round(timings[int(len(timings) * 0.95)], 4),
+        'facet_build_ms': round(facet_build_ms, 1),
+        'facet_p50_ms': round(statistics.median(facet_timings), 4),
+        'facet_p95_ms': round(facet_timings[int(len(facet_timings) * 0.95)], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args()
+    for n in args.products:
+        print(run(n))
+
+
+if __name__ == '__main__':
+    main()
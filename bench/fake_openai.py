@@ -0,0 +1,199 @@
+"""Local OpenAI-compatible stand-in for the chat completions API.
+
+Answers /v1/chat/completions with a canned reply, either as one JSON body
+or streamed as server-sent events, after a configurable delay. With
+tool_arguments set, a request offering tools is first answered with a
+search_products call. Errors (429, 5xx) and slow responses can be injected
+to exercise llm_client's retries, hedging and fallback. Point the app at it with:
+
+    python -m bench.fake_openai --port 8766 --first-token-delay 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8766/v1 OPENAI_API_KEY=test streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_REPLY = (
+    "¡Qué emoción! 💍 Para un compromiso te recomendaría el Anillo Solitario Compromiso "
+    "en oro blanco 18K. ¿Tienes algún presupuesto en mente?"
+)
+
+
+class FakeOpenAI:
+    """Canned chat completions with simulated latency"""
+
+    def __init__(self, reply=DEFAULT_REPLY, first_token_delay=0.0, token_delay=0.0, tool_arguments=None,
+                 errors=(), error_rate=0.0, error_status=503, error_models=None, retry_after=None,
+                 slow_rate=0.0, slow_delay=0.0, seed=None):
+        self.reply = reply
+        self.tool_arguments = tool_arguments
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        # Statuses answered to the first requests in order, then error_rate of
+        # the rest fail with error_status; only for error_models if given
+        self.errors = list(errors)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_models = error_models
+        self.retry_after = retry_after
+        # Share of requests delayed by slow_delay more seconds (tail latency)
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.random = random.Random(seed)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def record(self, body):
+        with self._lock:
+            self.requests.append(body)
+
+    def fault(self, body):
+        """(error status or None, extra delay) injected into this request"""
+        with self._lock:
+            status = None
+            if self.error_models is None or body.get('model') in self.error_models:
+                if self.errors:
+                    status = self.errors.pop(0)
+                elif self.random.random() < self.error_rate:
+                    status = self.error_status
+            delay = self.slow_delay if self.random.random() < self.slow_rate else 0.0
+        return status, delay
+
+    def tokens(self):
+        """Split the reply into word-sized stream chunks"""
+        words = self.reply.split(' ')
+        return [w if i == 0 else ' ' + w for i, w in enumerate(words)]
+
+    def tool_call(self, body):
+        """The search_products call to answer body with, or None for a text reply"""
+        messages = body.get('messages', [])
+        if self.tool_arguments is None or not body.get('tools') or (messages and messages[-1]['role'] == 'tool'):
+            return None
+        return {
+            'id': f"call_fake_{len(self.requests)}",
+            'type': 'function',
+            'function': {'name': 'search_products', 'arguments': json.dumps(self.tool_arguments)},
+        }
+
+    def usage(self, body):
+        # Rough local estimate; real token counts are not needed here
+        prompt_chars = sum(len(m.get('content') or '') for m in body.get('messages', []))
+        completion_tokens = len(self.tokens())
+        return {
+            'prompt_tokens': prompt_chars // 4,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_chars // 4 + completion_tokens,
+        }
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            fake.record(body)
+            status, delay = fake.fault(body)
+            time.sleep(fake.first_token_delay + delay)
+            if status:
+                self.send_json(status, {'error': {
+                    'message': f"Injected error {status}", 'type': 'rate_limit_error' if status == 429 else 'server_error',
+                }}, {'Retry-After': str(fake.retry_after)} if fake.retry_after is not None else {})
+                return
+
+            completion_id = f"chatcmpl-fake-{len(fake.requests)}"
+            base = {'id': completion_id, 'created': int(time.time()), 'model': body.get('model', 'gpt-4o-mini')}
+
+            call = fake.tool_call(body)
+            if body.get('stream'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                chunks = [{'role': 'assistant', 'content': ''}] + [{'content': t} for t in fake.tokens()]
+                if call:
+                    # Name first, then the arguments in two fragments, as the API does
+                    arguments = call['function']['arguments']
+                    half = len(arguments) // 2
+                    chunks = [
+                        {'role': 'assistant', 'content': None, 'tool_calls': [dict(
+                            call, index=0, function={'name': 'search_products', 'arguments': ''})]},
+                        {'tool_calls': [{'index': 0, 'function': {'arguments': arguments[:half]}}]},
+                        {'tool_calls': [{'index': 0, 'function': {'arguments': arguments[half:]}}]},
+                    ]
+                for i, delta in enumerate(chunks):
+                    if i > 1:
+                        time.sleep(fake.token_delay)
+                    event = dict(base, object='chat.completion.chunk',
+                                 choices=[{'index': 0, 'delta': delta, 'finish_reason': None}])
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                event = dict(base, object='chat.completion.chunk',
+                             choices=[{'index': 0, 'delta': {}, 'finish_reason': 'tool_calls' if call else 'stop'}])
+                self.wfile.write(f"data: {json.dumps(event)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+                return
+
+            time.sleep(fake.token_delay * len(fake.tokens()))
+            if call:
+                message, finish_reason = {'role': 'assistant', 'content': None, 'tool_calls': [call]}, 'tool_calls'
+            else:
+                message, finish_reason = {'role': 'assistant', 'content': fake.reply}, 'stop'
+            self.send_json(200, dict(
+                base, object='chat.completion',
+                choices=[{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+                usage=fake.usage(body),
+            ))
+
+        def send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(port=0, **options):
+    """Start a fake OpenAI server in a daemon thread and return (server, fake, base_url)"""
+    fake = FakeOpenAI(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f'http://127.0.0.1:{server.server_port}/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--reply', default=DEFAULT_REPLY)
+    parser.add_argument('--first-token-delay', type=float, default=0.5, help='Seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='Seconds between streamed tokens')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Share of requests delayed by --slow-delay')
+    parser.add_argument('--slow-delay', type=float, default=5.0)
+    args = parser.parse_args()
+
+    server, _, base_url = serve(args.port, reply=args.reply, first_token_delay=args.first_token_delay,
+                                token_delay=args.token_delay, error_rate=args.error_rate,
+                                error_status=args.error_status, slow_rate=args.slow_rate,
+                                slow_delay=args.slow_delay)
+    print(f"Fake OpenAI on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
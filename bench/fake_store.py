@@ -0,0 +1,264 @@
+"""Local stand-in for the Shopify storefront of lafianceejoyas.co.
+
+Serves a recorded catalog fixture through the same endpoints the scraper
+uses: the bulk JSON API, product and collection HTML pages and the product
+sitemap, with ETag revalidation, a configurable collection page size and
+per-request latency. Point the scraper at it with:
+
+    python -m bench.fake_store --port 8765
+    LAFIANCEE_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+from bench.synthetic import synthetic_catalog
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'store.json')
+# Shopify themes paginate collection pages by 24 products by default
+COLLECTION_PAGE_SIZE = 24
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+# Scripts and styles a Shopify theme inlines into every page
+THEME_HEAD = (
+    "<link rel='stylesheet' href='/cdn/theme.css'>"
+    "<style>" + ".product-grid .grid-item{margin:0 auto;padding:12px}" * 40 + "</style>"
+    "<script>window.ShopifyAnalytics = window.ShopifyAnalytics || {};"
+    + "window.ShopifyAnalytics.meta = {page: {pageType: 'product'}};" * 30 + "</script>"
+)
+THEME_FOOTER = (
+    "<div class='footer-links'>" + "<a href='/pages/contacto'>Contacto</a><a href='/policies/refund'>Cambios</a>" * 10
+    + "</div><script>" + "document.querySelectorAll('.money').forEach(function(e){});" * 30 + "</script>"
+)
+
+
+def load_fixture(path=FIXTURE):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def format_price(price):
+    """Render a Shopify decimal price the way the theme does: $1.250.000"""
+    return '$' + f"{int(float(price)):,}".replace(',', '.')
+
+
+class FakeStore:
+    """Routes storefront requests onto a fixture catalog"""
+
+    def __init__(self, catalog, json_api=True, structured_data=True, failures=0,
+                 page_size=COLLECTION_PAGE_SIZE, latency=0.0):
+        self.catalog = catalog
+        self.page_size = page_size
+        # Seconds added to every response, like a remote store's round trip
+        self.latency = latency
+        # Product pages answer 503 this many times before they succeed
+        self.failures = failures
+        self.failed = {}
+        self.json_api = json_api
+        self.structured_data = structured_data
+        self.products = {p['handle']: p for p in catalog['products']}
+        self.requests = 0
+        self._lock = threading.Lock()
+        # Real theme pages carry a menu and a related-products grid around the product
+        self.menu = ''.join(
+            f"<a class='menu-link' href='/collections/{c}'>{html.escape(c.title())}</a>"
+            for c in catalog.get('collections', {})
+        ) * 3
+        self.related = "<div class='related'>" + ''.join(
+            f"<div class='grid-item'><a href='/products/{p['handle']}'><img src='/cdn/{p['handle']}.jpg' "
+            f"alt='{html.escape(p['title'])}'><span class='title'>{html.escape(p['title'])}</span></a></div>"
+            for p in catalog['products'][:8]
+        ) + "</div>"
+
+    def page(self, items, query, size):
+        page = int(query.get('page', ['1'])[0])
+        limit = min(int(query.get('limit', [str(size)])[0]), size)
+        return items[(page - 1) * limit:page * limit]
+
+    def collection(self, name):
+        handles = self.catalog.get('collections', {}).get(name)
+        if handles is None:
+            return None
+        return [self.products[h] for h in handles if h in self.products]
+
+    def route(self, path, query):
+        """Return (status, content type, body) for a request"""
+        self.requests += 1
+        parts = [p for p in path.split('/') if p]
+
+        if self.json_api and path == '/products.json':
+            return 200, 'application/json', {'products': self.page(self.catalog['products'], query, 250)}
+        if self.json_api and len(parts) == 3 and parts[0] == 'collections' and parts[2] == 'products.json':
+            products = self.collection(parts[1])
+            if products is not None:
+                return 200, 'application/json', {'products': self.page(products, query, 250)}
+        if parts and parts[-1] in self.products and self.flaky(parts[-1]):
+            return 503, 'text/html', '<h1>503</h1>'
+        if len(parts) == 2 and parts[0] == 'products':
+            handle = parts[1]
+            if handle.endswith('.json') and self.json_api and handle[:-5] in self.products:
+                return 200, 'application/json', {'product': self.products[handle[:-5]]}
+            if handle in self.products:
+                return 200, 'text/html', self.product_html(self.products[handle])
+        if len(parts) == 4 and parts[0] == 'collections' and parts[2] == 'products' and parts[3] in self.products:
+            return 200, 'text/html', self.product_html(self.products[parts[3]])
+        if len(parts) == 2 and parts[0] == 'collections':
+            products = self.collection(parts[1])
+            if products is not None:
+                return 200, 'text/html', self.listing_html(self.page(products, query, self.page_size), parts[1])
+        if path == '/':
+            return 200, 'text/html', self.listing_html(self.catalog['products'][:self.page_size])
+        if path == '/collections':
+            return 200, 'text/html', self.listing_html([])
+        if path == '/sitemap.xml':
+            return 200, 'application/xml', self.sitemap_index()
+        if path == '/sitemap_products_1.xml':
+            return 200, 'application/xml', self.product_sitemap()
+        return 404, 'text/html', '<h1>404</h1>'
+
+    def flaky(self, handle):
+        """True while a product page still has to fail"""
+        with self._lock:
+            self.failed[handle] = self.failed.get(handle, 0) + 1
+            return self.failed[handle] <= self.failures
+
+    def product_html(self, product):
+        """Product page with theme chrome; JSON-LD and og: meta unless structured_data is off"""
+        price = format_price(product['variants'][0]['price']) if product.get('variants') else ''
+        title = html.escape(product['title'])
+        head = ''
+        if self.structured_data:
+            amount = product['variants'][0]['price'] if product.get('variants') else ''
+            description = ' '.join(TAG_RE.sub(' ', product.get('body_html', '')).split())
+            json_ld = json.dumps({
+                '@context': 'http://schema.org/',
+                '@type': 'Product',
+                'name': product['title'],
+                'description': description,
+                'url': f"/products/{product['handle']}",
+                'offers': [{'@type': 'Offer', 'price': v['price'], 'priceCurrency': 'COP'}
+                           for v in product.get('variants', [])],
+            }, ensure_ascii=False)
+            head = (
+                f"<meta property='og:title' content='{title}'>"
+                f"<meta property='og:description' content='{html.escape(description)}'>"
+                f"<meta property='og:price:amount' content='{amount}'>"
+                f"<meta property='og:price:currency' content='COP'>"
+                f"<script type='application/ld+json'>{json_ld}</script>"
+            )
+        return (
+            "<html><head><title>{title}</title>{head}{chrome_head}</head><body>"
+            "<header><nav>{menu}</nav></header>"
+            "<main><div class='product'>"
+            "<h1 class='product-title'>{title}</h1>"
+            "<span class='money'>{price}</span>"
+            "<div class='product-description'>{body}</div>"
+            "</div>{related}</main><footer>{footer}</footer></body></html>"
+        ).format(title=title, head=head, price=price, body=product.get('body_html', ''),
+                 chrome_head=THEME_HEAD, menu=self.menu, related=self.related, footer=THEME_FOOTER)
+
+    def listing_html(self, products, collection='all'):
+        links = ''.join(
+            f"<div class='grid-item'><a href='/collections/{collection}/products/{p['handle']}'>{html.escape(p['title'])}</a></div>"
+            for p in products
+        )
+        return f"<html><body><nav>{self.menu}</nav>{links}</body></html>"
+
+    def sitemap_index(self):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            '<sitemap><loc>https://lafianceejoyas.co/sitemap_products_1.xml?from=1&amp;to=99999</loc></sitemap>'
+            '<sitemap><loc>https://lafianceejoyas.co/sitemap_pages_1.xml</loc></sitemap>'
+            '</sitemapindex>'
+        )
+
+    def product_sitemap(self):
+        urls = ''.join(
+            f"<url><loc>https://lafianceejoyas.co/products/{p['handle']}</loc><lastmod>{p['updated_at']}</lastmod></url>"
+            for p in self.catalog['products']
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+        )
+
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            time.sleep(store.latency)
+            status, content_type, body = store.route(unquote(url.path), parse_qs(url.query))
+            if not isinstance(body, str):
+                body = json.dumps(body, ensure_ascii=False)
+            data = body.encode('utf-8')
+            etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            if status == 200:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(catalog=None, port=0, json_api=True, structured_data=True, failures=0,
+          page_size=COLLECTION_PAGE_SIZE, latency=0.0):
+    """Start a fake store in a daemon thread and return (server, store, base_url)"""
+    store = FakeStore(catalog or load_fixture(), json_api=json_api, structured_data=structured_data,
+                      failures=failures, page_size=page_size, latency=latency)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(store))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store, f'http://127.0.0.1:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixture', default=FIXTURE)
+    parser.add_argument('--no-json-api', action='store_true', help='Answer 404 on the JSON endpoints')
+    parser.add_argument('--no-structured-data', action='store_true', help='Leave JSON-LD and og: meta out of product pages')
+    parser.add_argument('--products', type=int, help='Serve a synthetic catalog of this size instead of the fixture')
+    parser.add_argument('--page-size', type=int, default=COLLECTION_PAGE_SIZE, help='Products per collection page')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    args = parser.parse_args()
+
+    if args.products:
+        catalog = synthetic_catalog(args.products)
+    else:
+        catalog = load_fixture(args.fixture)
+    server, _, base_url = serve(catalog, args.port, json_api=not args.no_json_api,
+                                structured_data=not args.no_structured_data, page_size=args.page_size,
+                                latency=args.latency)
+    print(f"Fake store on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+"""Load-test the chat app with concurrent sessions on one Streamlit server.
+
+    python -m bench.loadtest --sessions 20 --turns 4 --output load.json
+
+Starts `streamlit run app.py` headless against a synthetic store
+(bench.fake_store) and an OpenAI stand-in (bench.fake_openai), then drives
+--sessions browser sessions at once over Streamlit's websocket, the way
+the frontend does. Each session opens the app, asks for a catalog refresh,
+clicks quick actions and chats for --turns turns. Reported: script run
+latency per action, chat turns per second, upstream requests, the
+server's RSS with its growth per session, and the app's own metrics
+(reply time, time to first token, LLM requests), read from its /metrics
+exporter. The JSON has bench.run's layout, so `python -m bench.run
+--compare` works on two load test results.
+
+streamlit.testing's AppTest swaps a process-wide runtime on every run, so
+its sessions cannot run concurrently; hence the real server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from bench.bench_retrieval import QUERIES
+from bench.fake_openai import serve as serve_openai
+from bench.fake_store import serve as serve_store
+from bench.run import metadata, percentiles
+from bench.synthetic import synthetic_catalog
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+REFRESH = "🔄 Actualizar catálogo"
+QUICK_ACTIONS = ["💍 Anillo de compromiso", "🚚 Información de envíos", "💎 Garantía y calidad"]
+# Summaries of the app's /metrics included in the results
+APP_SPANS = ('reply', 'reply_first_token', 'llm_request', 'prompt_build', 'catalog_refresh', 'http_fetch')
+METRIC_RE = re.compile(r'^lafiancee_(\w+?)(_total|_seconds_count|_seconds)?(?:\{(.*)\})? (\S+)$')
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    """Resident set size of process pid, or None without /proc"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return None
+
+
+class RSSSampler:
+    """Peak RSS of a process while the sessions run, sampled from a daemon thread"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = rss_mb(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_mb(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Session:
+    """One browser tab: reruns the script with widget triggers and waits for it to finish.
+
+    widgets maps button labels and 'chat_input' to (widget id, fragment id).
+    """
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.widgets = {}
+        self.exceptions = []
+        self._ws = None
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+
+        self._ws = await websocket_connect(self.url, max_message_size=64 * 2 ** 20)
+
+    def close(self):
+        if self._ws is not None:
+            self._ws.close()
+
+    async def rerun(self, widget=None, value=None):
+        """Rerun the script, clicking button widget or sending value to the chat input"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()
+        if widget is not None:
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id, fragment_id = self.widgets[widget]
+            # As the browser does, a widget inside a fragment reruns only that fragment
+            if fragment_id:
+                msg.rerun_script.fragment_id = fragment_id
+            if value is None:
+                state.trigger_value = True
+            else:
+                state.string_trigger_value.data = value
+        self.exceptions = []
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+        await asyncio.wait_for(self._until_finished(), self.timeout)
+        if self.exceptions:
+            raise RuntimeError(self.exceptions[0])
+
+    async def _until_finished(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            data = await self._ws.read_message()
+            if data is None:
+                raise ConnectionError('El servidor cerró la conexión')
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof('type')
+            if kind == 'script_finished' and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return
+            if kind != 'delta' or msg.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = msg.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type == 'button':
+                self.widgets[element.button.label] = (element.button.id, msg.delta.fragment_id)
+            elif element_type == 'chat_input':
+                self.widgets['chat_input'] = (element.chat_input.id, msg.delta.fragment_id)
+            elif element_type == 'exception':
+                self.exceptions.append(f"{element.exception.type}: {element.exception.message}")
+
+    async def step(self, action, steps, widget=None, value=None):
+        start = time.perf_counter()
+        try:
+            await self.rerun(widget, value)
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        steps.append((action, (time.perf_counter() - start) * 1000, error))
+        return error is None
+
+
+async def run_session(url, number, turns, quick_actions, timeout, delay):
+    """One customer: open, refresh, quick actions, then a chat; returns its steps"""
+    await asyncio.sleep(delay)
+    session = Session(url, timeout)
+    steps = []
+    try:
+        await session.connect()
+        plan = [('open', None, None), ('refresh', REFRESH, None)]
+        plan += [('quick_action', label, None) for label in QUICK_ACTIONS[:quick_actions]]
+        # Sessions ask different questions, so the reply cache does not answer them all
+        plan += [('chat', 'chat_input', f"{QUERIES[(number + turn) % len(QUERIES)]} ({number}.{turn})")
+                 for turn in range(turns)]
+        for action, widget, value in plan:
+            if not await session.step(action, steps, widget, value):
+                break
+    except Exception as e:
+        steps.append(('connect', 0.0, f"{type(e).__name__}: {e}"))
+    finally:
+        session.close()
+    return steps
+
+
+async def warm_up(url, timeout):
+    """Open one session and wait out the first catalog scan; returns its duration in ms"""
+    session = Session(url, timeout)
+    await session.connect()
+    start = time.perf_counter()
+    try:
+        await session.rerun()
+        # A browser reruns the sidebar's polling fragment until the catalog loads; rerun the page
+        while 'chat_input' not in session.widgets:
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError('El catálogo no cargó durante el calentamiento')
+            await asyncio.sleep(0.5)
+            await session.rerun()
+    finally:
+        session.close()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_sessions(url, args):
+    return await asyncio.gather(*(
+        run_session(url, n, args.turns, args.quick_actions, args.timeout, n * args.ramp / args.sessions)
+        for n in range(args.sessions)
+    ))
+
+
+def app_metrics(text):
+    """Selected summaries and all counters from the app's Prometheus text"""
+    spans, counters = {}, {}
+    for line in text.splitlines():
+        match = METRIC_RE.match(line)
+        if not match:
+            continue
+        name, suffix, labels, value = match.groups()
+        labels = dict(LABEL_RE.findall(labels or ''))
+        quantile = labels.pop('quantile', None)
+        key = name + ''.join(f"[{k}={v}]" for k, v in labels.items())
+        if suffix == '_total':
+            counters[key] = float(value)
+        elif name in APP_SPANS and suffix == '_seconds_count':
+            spans.setdefault(key, {})['count'] = int(value)
+        elif name in APP_SPANS and suffix == '_seconds' and quantile in ('0.5', '0.95'):
+            spans.setdefault(key, {})[f"p{round(float(quantile) * 100)}_ms"] = round(float(value) * 1000, 3)
+    return {'spans': spans, 'counters': counters}
+
+
+def start_server(port, env, timeout=60):
+    command = [
+        sys.executable, '-m', 'streamlit', 'run', APP, '--server.headless', 'true',
+        '--server.port', str(port), '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false',
+    ]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1):
+                return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('El servidor de Streamlit no arrancó')
+
+
+def run(args):
+    store_server, store, store_url = serve_store(synthetic_catalog(args.products), latency=args.store_latency)
+    openai_server, fake, openai_url = serve_openai(first_token_delay=args.first_token_delay,
+                                                   token_delay=args.token_delay)
+    directory = tempfile.mkdtemp(prefix='lafiancee-loadtest-')
+    port, metrics_port = free_port(), free_port()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY='loadtest',
+        OPENAI_BASE_URL=openai_url,
+        LAFIANCEE_BASE_URL=store_url,
+        LAFIANCEE_HTTP_CACHE=os.path.join(directory, 'http_cache.sqlite3'),
+        LAFIANCEE_SNAPSHOT=os.path.join(directory, 'catalog.jsonl'),
+        LAFIANCEE_FRONTIER=os.path.join(directory, 'frontier.sqlite3'),
+        LAFIANCEE_REFRESH_INTERVAL='0',
+        LAFIANCEE_STREAM='0' if args.no_stream else '1',
+        LAFIANCEE_METRICS_PORT=str(metrics_port),
+    )
+    server = start_server(port, env)
+    url = f'ws://127.0.0.1:{port}/_stcore/stream'
+    try:
+        rss_start = rss_mb(server.pid)
+        cold_start_ms = asyncio.run(warm_up(url, args.timeout))
+        rss_warm = rss_mb(server.pid)
+        fake.requests.clear()
+        store.requests = 0
+
+        start = time.perf_counter()
+        with RSSSampler(server.pid) as sampler:
+            sessions = asyncio.run(run_sessions(url, args))
+        elapsed = time.perf_counter() - start
+        # Closed sessions linger on the server until its cleanup, like abandoned tabs
+        rss_end = rss_mb(server.pid)
+        with urllib.request.urlopen(f'http://127.0.0.1:{metrics_port}/metrics', timeout=5) as response:
+            metrics_text = response.read().decode('utf-8')
+    finally:
+        server.terminate()
+        server.wait()
+        store_server.shutdown()
+        openai_server.shutdown()
+
+    steps = [step for session_steps in sessions for step in session_steps]
+    errors = [(action, error) for action, _, error in steps if error]
+    actions = {}
+    for action, ms, error in steps:
+        if not error:
+            actions.setdefault(action, []).append(ms)
+    turns = len(actions.get('chat', [])) + len(actions.get('quick_action', []))
+    memory = None
+    if rss_end is not None:
+        memory = {
+            'rss_start_mb': round(rss_start, 1),
+            'rss_warm_mb': round(rss_warm, 1),
+            'rss_peak_mb': round(sampler.peak, 1),
+            'rss_end_mb': round(rss_end, 1),
+            'per_session_mb': round((rss_end - rss_warm) / args.sessions, 3),
+        }
+    return {
+        'sessions': args.sessions,
+        'completed_sessions': sum(1 for session_steps in sessions if session_steps and not session_steps[-1][2]),
+        'cold_start_ms': round(cold_start_ms, 1),
+        'elapsed_s': round(elapsed, 3),
+        'turns_per_second': round(turns / elapsed, 2),
+        'actions': {action: {'count': len(ms), **percentiles(ms), 'max_ms': round(max(ms), 3)}
+                    for action, ms in actions.items()},
+        'errors': len(errors),
+        'error_samples': sorted({f"{action}: {error}" for action, error in errors})[:5],
+        'upstream': {'openai_requests': len(fake.requests), 'store_requests': store.requests},
+        'memory': memory,
+        # Includes the warm-up session
+        'app': app_metrics(metrics_text),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent sessions')
+    parser.add_argument('--turns', type=int, default=3, help='Typed chat turns per session')
+    parser.add_argument('--quick-actions', type=int, default=2, choices=range(len(QUICK_ACTIONS) + 1),
+                        help='Quick action buttons each session clicks')
+    parser.add_argument('--ramp', type=float, default=1.0, help='Seconds over which the sessions start')
+    parser.add_argument('--products', type=int, default=200, help='Products in the synthetic store')
+    parser.add_argument('--store-latency', type=float, default=0.01, help='Seconds per store response')
+    parser.add_argument('--first-token-delay', type=float, default=0.3, help='Fake OpenAI seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Fake OpenAI seconds between tokens')
+    parser.add_argument('--no-stream', action='store_true', help='Run the app with LAFIANCEE_STREAM=0')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Seconds one script run may take')
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    results = {'loadtest': run(args)}
+    output = json.dumps({'meta': metadata(args), 'results': results}, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
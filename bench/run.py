@@ -0,0 +1,239 @@
+"""Run the offline benchmark suite and write the results as JSON.
+
+    python -m bench.run --products 500 --output results.json
+    python -m bench.run --compare baseline.json results.json
+
+Everything runs against local servers: a synthetic Shopify-like store
+(bench.fake_store) and an OpenAI-compatible stub (bench.fake_openai).
+Measured: catalog scan time (JSON API, HTML crawl and incremental rescan),
+per-page parse time, retrieval, prompt build time and size, and the
+latency of whole chat turns. --compare prints the change of every timing
+and size between two result files and exits with status 1 on regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import bench_parser, bench_retrieval
+from bench.bench_retrieval import HISTORY, QUERIES
+from bench.fake_openai import serve as serve_openai
+from bench.fake_store import COLLECTION_PAGE_SIZE, serve as serve_store
+from bench.synthetic import synthetic_catalog, synthetic_products
+
+# Keys of timings and sizes, where lower is better
+LOWER_IS_BETTER = ('_ms', '_s', '_mb', '_tokens', '_chars', 'requests')
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+    }
+
+
+def bench_scan(n_products, page_size, latency, requests_per_second):
+    """Full scans through the JSON API and the HTML crawl, then a cached incremental rescan"""
+    from scraper import LaFianceeJoyasScraper
+
+    catalog = synthetic_catalog(n_products)
+    results = {}
+    for mode, json_api in (('json', True), ('html', False)):
+        server, store, base_url = serve_store(catalog, json_api=json_api, page_size=page_size, latency=latency)
+        scraper = LaFianceeJoyasScraper(requests_per_second=requests_per_second, cache_path=None,
+                                        base_url=base_url, frontier_path=None)
+        start = time.perf_counter()
+        scraper.scrape_catalog(max_products=None)
+        results[mode] = {
+            'scan_s': round(time.perf_counter() - start, 3),
+            'products': len(scraper.data['products']),
+            'requests': store.requests,
+        }
+        server.shutdown()
+
+    server, store, base_url = serve_store(catalog, page_size=page_size, latency=latency)
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, 'http_cache.sqlite3')
+        scraper = LaFianceeJoyasScraper(requests_per_second=requests_per_second, cache_path=cache_path,
+                                        base_url=base_url, frontier_path=None)
+        scraper.scrape_catalog(max_products=None)
+        previous, store.requests = scraper.data, 0
+        scraper = LaFianceeJoyasScraper(requests_per_second=requests_per_second, cache_path=cache_path,
+                                        base_url=base_url, frontier_path=None)
+        start = time.perf_counter()
+        scraper.refresh_incremental(previous, max_products=None)
+        results['incremental'] = {
+            'scan_s': round(time.perf_counter() - start, 3),
+            'products': len(scraper.data['products']),
+            'requests': store.requests,
+        }
+    server.shutdown()
+    return results
+
+
+def bench_parse(n_pages):
+    return {
+        label: bench_parser.run(label, bench_parser.rendered_pages(n_pages, structured))
+        for label, structured in (('structured', True), ('fallback', False))
+    }
+
+
+def bench_prompt(n_products, repeat=20):
+    """build_messages time and the size of what it sends, per query"""
+    import assistant
+    from catalog import Catalog
+    from history import count_tokens
+
+    knowledge_base = Catalog.build(synthetic_products(n_products))
+    conversations = [
+        [{'role': 'user', 'content': text} for text in HISTORY + [query]] for query in QUERIES
+    ]
+    start = time.perf_counter()
+    assistant.build_messages(conversations[0], knowledge_base)
+    first_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(repeat):
+        for messages in conversations:
+            start = time.perf_counter()
+            assistant.build_messages(messages, knowledge_base)
+            timings.append((time.perf_counter() - start) * 1000)
+    sizes = [
+        [m['content'] for m in assistant.build_messages(messages, knowledge_base)] for messages in conversations
+    ]
+    return {
+        'first_ms': round(first_ms, 1),
+        **percentiles(timings),
+        'system_prompt_tokens': count_tokens(assistant.get_system_prompt(knowledge_base)),
+        'prompt_chars': round(statistics.mean(sum(len(c) for c in contents) for contents in sizes)),
+        'prompt_tokens': round(statistics.mean(sum(count_tokens(c) for c in contents) for contents in sizes)),
+    }
+
+
+def bench_turns(n_products, first_token_delay, token_delay, turns=8):
+    """Latency of whole chat turns against the fake OpenAI server, streamed and not"""
+    server, fake, base_url = serve_openai(first_token_delay=first_token_delay, token_delay=token_delay)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    import assistant
+    from catalog import Catalog
+    from history import ConversationHistory
+
+    knowledge_base = Catalog.build(synthetic_products(n_products))
+    # Warm-up: client creation and the per-version prompt and indexes are not per-turn costs
+    assistant.chat_with_openai([{'role': 'user', 'content': 'hola'}], 'bench', knowledge_base)
+    fake.requests.clear()
+    results = {}
+    for stream in (False, True):
+        first_chunk, total = [], []
+        for i in range(turns):
+            # A new question every turn, so none is answered from the reply cache
+            messages = [{'role': 'user', 'content': f"{QUERIES[i % len(QUERIES)]} ({stream}, {i})"}]
+            start = time.perf_counter()
+            reply = assistant.chat_with_openai(messages, 'bench', knowledge_base, stream=stream,
+                                               history=ConversationHistory())
+            if stream:
+                for n, _ in enumerate(reply):
+                    if n == 0:
+                        first_chunk.append((time.perf_counter() - start) * 1000)
+            total.append((time.perf_counter() - start) * 1000)
+        results['stream' if stream else 'complete'] = {
+            **({'first_token_' + k: v for k, v in percentiles(first_chunk).items()} if stream else {}),
+            **percentiles(total),
+        }
+    results['upstream_requests'] = len(fake.requests)
+    server.shutdown()
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': vars(args),
+    }
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(baseline_path, current_path, threshold):
+    """Print the change of every lower-is-better metric; returns the regressed keys"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = flatten(json.load(f)['results'])
+    with open(current_path, encoding='utf-8') as f:
+        current = flatten(json.load(f)['results'])
+    regressions = []
+    for key in sorted(baseline.keys() & current.keys()):
+        if not key.endswith(LOWER_IS_BETTER) or not baseline[key]:
+            continue
+        change = current[key] / baseline[key] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{key:50} {baseline[key]:>12} {current[key]:>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=500, help='Products in the synthetic store')
+    parser.add_argument('--page-size', type=int, default=COLLECTION_PAGE_SIZE, help='Products per collection page')
+    parser.add_argument('--store-latency', type=float, default=0.01, help='Seconds per store response')
+    parser.add_argument('--requests-per-second', type=float, default=200.0, help="The scraper's rate limit")
+    parser.add_argument('--pages', type=int, default=200, help='Product pages parsed')
+    parser.add_argument('--retrieval-products', type=int, default=10000)
+    parser.add_argument('--first-token-delay', type=float, default=0.3, help='Fake OpenAI seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Fake OpenAI seconds between tokens')
+    parser.add_argument('--only', nargs='+', choices=['scan', 'parse', 'retrieval', 'prompt', 'turn'])
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='Compare two result files')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown reported as a regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    suites = {
+        'scan': lambda: bench_scan(args.products, args.page_size, args.store_latency, args.requests_per_second),
+        'parse': lambda: bench_parse(args.pages),
+        'retrieval': lambda: bench_retrieval.run(args.retrieval_products),
+        'prompt': lambda: bench_prompt(args.products),
+        'turn': lambda: bench_turns(args.products, args.first_token_delay, args.token_delay),
+    }
+    results = {}
+    for name, run in suites.items():
+        if not args.only or name in args.only:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run()
+
+    output = json.dumps({'meta': metadata(args), 'results': results}, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
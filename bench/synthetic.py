@@ -0,0 +1,63 @@
+"""Synthetic Shopify-like catalogs of any size for offline benchmarks."""
+import random
+
+KINDS = [
+    ('Cadena', 'cadenas', ['Cartier', 'Lazo', 'Veneciana', 'Singapur', 'Rolo', 'Figaro']),
+    ('Pulsera', 'pulseras', ['Tejida', 'Esclava', 'Tenis', 'Rígida', 'Eslabones']),
+    ('Topos', 'aretes', ['Corazón', 'Estrella', 'Perla', 'Argolla', 'Trébol']),
+    ('Anillo', 'anillos', ['Solitario', 'Compromiso', 'Eternity', 'Sello', 'Entrelazado']),
+    ('Argollas', 'anillos', ['Matrimonio Clásicas', 'Confort', 'Diamantadas']),
+    ('Dije', 'dijes', ['Virgen Milagrosa', 'Inicial', 'Cruz', 'Ángel', 'San Benito', 'Árbol de la Vida']),
+]
+MATERIALS = ['oro amarillo', 'oro blanco', 'oro rosa', 'tres oros', 'oro']
+BOILERPLATE = 'Joya en oro 18K italiano con certificado de garantía. Envío asegurado a toda Colombia.'
+
+
+def synthetic_catalog(n_products, seed=0):
+    """Return a store fixture ({'products', 'collections'}) with n_products items"""
+    rng = random.Random(seed)
+    products = []
+    collections = {'all': []}
+    for i in range(1, n_products + 1):
+        kind, collection, styles = rng.choice(KINDS)
+        style = rng.choice(styles)
+        material = rng.choice(MATERIALS)
+        title = f"{kind} {style} {material.title()} {i}"
+        grams = round(rng.uniform(0.8, 12), 1)
+        size = rng.choice([f"{rng.randint(40, 60)} cm", f"{rng.randint(3, 12)} mm", ''])
+        body = f"<p>{kind} {style.lower()} en {material} 18K. Peso: {str(grams).replace('.', ',')} gr. {size}</p>"
+        if rng.random() < 0.5:
+            body += f"<p>{BOILERPLATE}</p>"
+        handle = f"{kind}-{style}-{material}-{i}".lower().replace(' ', '-')
+        products.append({
+            'id': 8000000000 + i,
+            'title': title,
+            'handle': handle,
+            'body_html': body,
+            'vendor': 'La Fiancee Joyas',
+            'product_type': collection.title(),
+            'updated_at': f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}T10:00:00-05:00",
+            'tags': [collection],
+            'variants': [{
+                'id': 42000000000 + i,
+                'title': 'Default Title',
+                'price': f"{rng.randrange(200_000, 9_000_000, 10_000)}.00",
+                'grams': int(grams),
+                'available': True,
+            }],
+        })
+        collections.setdefault(collection, []).append(handle)
+        collections['all'].append(handle)
+    return {'products': products, 'collections': collections}
+
+
+def synthetic_products(n_products, seed=0):
+    """Product records as the scraper would produce them from a synthetic catalog"""
+    from catalog import Product
+    from scraper import LaFianceeJoyasScraper
+
+    scraper = LaFianceeJoyasScraper(cache_path=None)
+    return [
+        Product.from_dict(scraper.parse_product_json(item))
+        for item in synthetic_catalog(n_products, seed)['products']
+    ]
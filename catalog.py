@@ -0,0 +1,132 @@
+import hashlib
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, fields
+
+# Products shown in the sidebar and footer previews
+PREVIEW_SIZE = 9
+
+_DIGITS_RE = re.compile(r'\d+')
+_NUMBER_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(gr|g|cm|mm)?')
+
+
+def catalog_version(products):
+    """Content hash identifying a catalog; unchanged stores always hash the same"""
+    payload = json.dumps(products, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def price_cop(price):
+    """Numeric COP value of a display price such as '$1250000'"""
+    digits = ''.join(_DIGITS_RE.findall(price or ''))
+    return int(digits) if digits else None
+
+
+def weight_grams(weight):
+    """Grams in a weight such as '3,7gr'"""
+    match = _NUMBER_RE.search(weight or '')
+    return float(match.group(1).replace(',', '.')) if match else None
+
+
+def size_mm(size):
+    """Millimetres in a size such as '50cm' or '10mm'"""
+    match = _NUMBER_RE.search(size or '')
+    if not match:
+        return None
+    value = float(match.group(1).replace(',', '.'))
+    return value * 10 if match.group(2) == 'cm' else value
+
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    """One catalog product; missing attributes are None.
+
+    category and material take the values of product_parser's
+    CATEGORY_LABELS and MATERIAL_LABELS; the typed price_cop, weight_g
+    and size_mm are derived from the display strings.
+    """
+    name: str
+    url: str = ''
+    price: str = None
+    description: str = None
+    material: str = None
+    weight: str = None
+    size: str = None
+    category: str = None
+    lastmod: str = None
+    price_cop: int = None
+    weight_g: float = None
+    size_mm: float = None
+
+    @classmethod
+    def from_dict(cls, data):
+        values = {f.name: data.get(f.name) for f in fields(cls) if data.get(f.name) is not None}
+        for field, derive, source in DERIVED:
+            if field not in values:
+                values[field] = derive(values.get(source))
+        return cls(**values)
+
+    def to_dict(self, derived=False):
+        """The scraper's dict form, without the missing attributes.
+
+        The DERIVED fields are left out unless derived is true: from_dict
+        recomputes them, and scraped dicts compared with this form never
+        have them.
+        """
+        skip = () if derived else _DERIVED_FIELDS
+        return {
+            f.name: getattr(self, f.name) for f in fields(self)
+            if getattr(self, f.name) is not None and f.name not in skip
+        }
+
+
+# Typed fields derived from display strings: (field, function, source field)
+DERIVED = [
+    ('price_cop', price_cop, 'price'),
+    ('weight_g', weight_grams, 'weight'),
+    ('size_mm', size_mm, 'size'),
+]
+_DERIVED_FIELDS = frozenset(field for field, _, _ in DERIVED)
+
+
+@dataclass(frozen=True, slots=True)
+class Catalog:
+    """Immutable, versioned catalog shared by every session of the process.
+
+    Aggregates the UI needs on each rerun (category counts, previews) are
+    computed once when the catalog is built.
+    """
+    version: str
+    products: tuple
+    categories: tuple
+    category_counts: tuple
+    preview: tuple
+    tombstones: tuple = ()
+
+    @classmethod
+    def from_data(cls, data):
+        """Build a catalog from a scraper's data dict"""
+        return cls.build(tuple(Product.from_dict(p) for p in data['products']), tombstones=data.get('tombstones', ()))
+
+    @classmethod
+    def build(cls, products, version=None, tombstones=()):
+        """Catalog of Product records; the version is their content hash unless given"""
+        counts = Counter(p.category for p in products if p.category)
+        return cls(
+            version=version or catalog_version([p.to_dict() for p in products]),
+            products=tuple(products),
+            categories=tuple(sorted(counts)),
+            category_counts=tuple(sorted(counts.items())),
+            preview=tuple(products[:PREVIEW_SIZE]),
+            tombstones=tuple(tombstones),
+        )
+
+    def to_data(self):
+        """The scraper's data dict form, as taken by refresh_incremental"""
+        return {
+            'products': [p.to_dict() for p in self.products],
+            'categories': list(self.categories),
+            'tombstones': list(self.tombstones),
+            'version': self.version,
+        }
@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+
+import metrics
+import snapshot
+from catalog import Catalog
+from scraper import LaFianceeJoyasScraper
+
+# Seconds between scheduled catalog refreshes (0 disables the schedule)
+REFRESH_INTERVAL = float(os.getenv('LAFIANCEE_REFRESH_INTERVAL', str(6 * 3600)))
+
+log = logging.getLogger(__name__)
+
+
+class CatalogWorker:
+    """Background thread that owns the scraper and publishes catalog versions.
+
+    Refreshes run on a schedule or when trigger() is called, never on a
+    Streamlit script run. A refresh builds a whole new immutable Catalog
+    with a fresh scraper and only then swaps it in, so readers of current()
+    keep the previous version until the new one is complete. Each
+    published catalog is saved as a snapshot, which the next process
+    serves from the moment it starts.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL, scraper_factory=LaFianceeJoyasScraper,
+                 snapshot_path=snapshot.DEFAULT_PATH):
+        self.interval = interval
+        self.scraper_factory = scraper_factory
+        self.snapshot_path = snapshot_path
+        self._catalog = None
+        # Time of the last refresh attempt (or of the loaded snapshot)
+        self._attempted_at = None
+        self._status = {
+            'state': 'idle',
+            'progress': None,
+            'error': None,
+            'changes': None,
+            'cache': None,
+            'refreshed_at': None,
+        }
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Publish the snapshot, if any, and start the worker thread.
+
+        The first refresh runs right away without a snapshot, otherwise
+        when the snapshot is one interval old.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='catalog-worker', daemon=True)
+        loaded = snapshot.load(self.snapshot_path) if self.snapshot_path else None
+        if loaded:
+            catalog, created_at = loaded
+            self.publish(catalog)
+            self._attempted_at = created_at
+            self._update(refreshed_at=created_at)
+        else:
+            self._update(state='scanning')
+            self._wake.set()
+        self._thread.start()
+
+    def current(self):
+        """The latest published catalog, or None before the first refresh completes"""
+        return self._catalog
+
+    def publish(self, catalog):
+        """Swap in a complete catalog as the current version"""
+        self._catalog = catalog
+
+    def trigger(self):
+        """Ask for a refresh as soon as possible; returns False if one is already running"""
+        with self._lock:
+            if self._status['state'] == 'scanning':
+                return False
+            # Scanning from now on, so the caller can render the progress right away
+            self._status.update(state='scanning', progress=None, error=None)
+            self._wake.set()
+        return True
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def _update(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self.interval:
+                timeout = max(0, (self._attempted_at or time.time()) + self.interval - time.time())
+            self._wake.wait(timeout)
+            with self._lock:
+                # Together with the state, so a trigger() during this refresh is not queued
+                self._wake.clear()
+                self._status.update(state='scanning', progress=None, error=None)
+            self._attempted_at = time.time()
+            try:
+                self.refresh()
+            except Exception as e:
+                log.exception("Error refreshing catalog")
+                self._update(state='error', progress=None, error=str(e))
+
+    def refresh(self):
+        """Scan the store and publish the result; returns True on success"""
+        self._update(state='scanning', progress=None, error=None)
+        scraper = self.scraper_factory()
+        progress = lambda done, total: self._update(progress=(done, total))
+        previous = self.current()
+        with metrics.span('catalog_refresh', mode='incremental' if previous else 'full'):
+            if previous:
+                # Only products added or changed since the last scan are fetched again
+                success = scraper.refresh_incremental(previous.to_data(), progress=progress)
+            else:
+                success = scraper.scrape_catalog(progress=progress)
+        metrics.count('catalog_refreshes', result='ok' if success else 'error')
+
+        cache = scraper.cache.stats() if scraper.cache else None
+        if not success:
+            self._update(state='error', progress=None, cache=cache,
+                         error=scraper.error or 'No se encontraron productos')
+            return False
+        catalog = Catalog.from_data(scraper.data)
+        self.publish(catalog)
+        log.info("Published catalog", extra={'version': catalog.version, 'products': len(catalog.products)})
+        if self.snapshot_path:
+            try:
+                snapshot.save(catalog, self.snapshot_path)
+            except OSError as e:
+                log.error("Error saving catalog snapshot", extra={'path': self.snapshot_path, 'error': str(e)})
+        self._update(state='idle', progress=None, changes=scraper.changes, cache=cache,
+                     refreshed_at=time.time())
+        return True
@@ -0,0 +1,101 @@
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+# Results returned by one search unless asked for fewer
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 25
+SORTS = ('relevance', 'price_asc', 'price_desc')
+
+
+def bitmap(ids, size):
+    """Python int with bit i set for each position i in ids"""
+    bits = bytearray((size + 7) // 8)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class FacetIndex:
+    """Sorted and bitmap indexes over the typed product fields.
+
+    category and material map each value to a bitmap of the products that
+    have it; price_cop, weight_g and size_mm keep the product positions
+    sorted by value, so a range is two bisects. Filters combine with a
+    bitwise AND, whatever the catalog size.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.size = len(products)
+        self.all = (1 << self.size) - 1
+        self.bitmaps = {}
+        for field in ('category', 'material'):
+            positions = {}
+            for i, p in enumerate(products):
+                value = getattr(p, field)
+                if value:
+                    positions.setdefault(value, []).append(i)
+            self.bitmaps[field] = {value: bitmap(ids, self.size) for value, ids in positions.items()}
+        self.sorted = {}
+        for field in ('price_cop', 'weight_g', 'size_mm'):
+            pairs = sorted((getattr(p, field), i) for i, p in enumerate(products) if getattr(p, field) is not None)
+            self.sorted[field] = ([v for v, _ in pairs], [i for _, i in pairs])
+
+    def range_bitmap(self, field, low=None, high=None):
+        """Products with low <= field <= high; products without a value never match"""
+        values, ids = self.sorted[field]
+        start = bisect_left(values, low) if low is not None else 0
+        end = bisect_right(values, high) if high is not None else len(values)
+        return bitmap(ids[start:end], self.size)
+
+    def filter(self, category=None, material=None, ranges=()):
+        """Bitmap of the products matching every given facet; ranges holds (field, low, high)"""
+        bits = self.all
+        if category:
+            bits &= self.bitmaps['category'].get(category, 0)
+        if material:
+            bits &= self.bitmaps['material'].get(material, 0)
+        for field, low, high in ranges:
+            if low is not None or high is not None:
+                bits &= self.range_bitmap(field, low, high)
+        return bits
+
+    def search(self, category=None, material=None, ranges=(), query=None, text_index=None,
+               sort=None, limit=SEARCH_LIMIT):
+        """Return (number of matches, up to limit matching products).
+
+        Results go from the cheapest up, or the dearest down with
+        sort='price_desc'; products without a price come last. A query
+        (through text_index, a retrieval.ProductIndex over the same
+        products) only ranks: matches that also match its text come first,
+        by relevance unless a price sort is asked for, and the rest follow,
+        so words no product has never hide a facet match.
+        """
+        bits = self.filter(category, material, ranges)
+        member = bits.to_bytes((self.size + 7) // 8, 'little')
+        matches = lambda ids: (i for i in ids if member[i >> 3] >> (i & 7) & 1)
+        descending = sort == 'price_desc'
+
+        ranked = []
+        if query and text_index is not None:
+            ranked = list(matches(text_index.search_ids(query, k=self.size)))
+            if sort in ('price_asc', 'price_desc'):
+                ranked.sort(key=lambda i: self.price_key(i, descending))
+        order = ranked[:limit]
+        if len(order) < limit:
+            seen = set(ranked)
+            priced = self.sorted['price_cop'][1]
+            unpriced = (i for i in range(self.size) if self.products[i].price_cop is None)
+            for i in matches(chain(reversed(priced) if descending else priced, unpriced)):
+                if len(order) >= limit:
+                    break
+                if i not in seen:
+                    order.append(i)
+        return bits.bit_count(), [self.products[i] for i in order]
+
+    def price_key(self, i, descending=False):
+        """Sort key by price, with products without one last either way"""
+        price = self.products[i].price_cop
+        if price is None:
+            return (1, 0)
+        return (0, -price if descending else price)
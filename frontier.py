@@ -0,0 +1,166 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_PATH = os.getenv('LAFIANCEE_FRONTIER', os.path.join('.cache', 'frontier.sqlite3'))
+MAX_ATTEMPTS = 3
+# Seconds before the first retry of a failed URL, doubled on each attempt
+BACKOFF = 2.0
+MAX_BACKOFF = 60.0
+# Completed URLs are committed to disk in batches of this size
+CHECKPOINT_EVERY = 25
+# An interrupted crawl older than this starts over instead of resuming
+RESUME_MAX_AGE = 24 * 3600
+
+
+def canonical_product_url(url, base_url):
+    """'<base_url>/products/<handle>' for any product URL, None for anything else.
+
+    Shopify serves the same product under /products/<handle>,
+    /collections/<c>/products/<handle> and with query strings or a
+    trailing slash; all of them map to one URL per handle.
+    """
+    parts = [p for p in urlparse(url).path.split('/') if p]
+    if len(parts) < 2 or parts[-2] != 'products':
+        return None
+    handle = parts[-1]
+    if handle.endswith('.json'):
+        handle = handle[:-5]
+    return f"{base_url.rstrip('/')}/products/{handle}" if handle else None
+
+
+class CrawlFrontier:
+    """Persisted queue of the product URLs of one crawl.
+
+    Every URL is pending, done (with its scraped product) or failed. A
+    failed fetch is retried with exponential backoff up to max_attempts.
+    Completed work is checkpointed to SQLite, so a crawl interrupted by an
+    error or a restart resumes with only the URLs still pending. Pass
+    path=':memory:' for a frontier that lives only as long as the crawl.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_attempts=MAX_ATTEMPTS, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                error TEXT,
+                product TEXT
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS crawl (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM crawl WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def start(self, base_url):
+        """Resume the interrupted crawl of base_url, or start a new one; returns True when resuming"""
+        with self._lock:
+            started_at = float(self._meta('started_at') or 0)
+            resume = (
+                self._meta('status') == 'running' and self._meta('base_url') == base_url
+                and time.time() - started_at < RESUME_MAX_AGE
+            )
+            if not resume:
+                self._conn.execute("DELETE FROM frontier")
+                started_at = time.time()
+            self._conn.executemany("INSERT OR REPLACE INTO crawl VALUES (?, ?)", [
+                ('base_url', base_url), ('status', 'running'), ('started_at', str(started_at)),
+            ])
+            self._conn.commit()
+            return resume
+
+    def add(self, url):
+        """Queue a discovered URL; returns True if it should be fetched now"""
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO frontier (url) VALUES (?)", (url,))
+            row = self._conn.execute("SELECT state, next_attempt FROM frontier WHERE url = ?", (url,)).fetchone()
+            self._tick()
+            return row[0] == 'pending' and row[1] <= time.time()
+
+    def done(self, url, product):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE frontier SET state = 'done', error = NULL, product = ? WHERE url = ?",
+                (json.dumps(product, ensure_ascii=False), url)
+            )
+            self._tick()
+
+    def fail(self, url, error, permanent=False):
+        """Record a failed fetch, scheduling a retry unless it is permanent or out of attempts"""
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM frontier WHERE url = ?", (url,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            state = 'failed' if permanent or attempts >= self.max_attempts else 'pending'
+            self._conn.execute(
+                "UPDATE frontier SET state = ?, attempts = ?, next_attempt = ?, error = ? WHERE url = ?",
+                (state, attempts, time.time() + delay, str(error)[:500], url)
+            )
+            self._tick()
+
+    def due(self):
+        """Pending URLs whose retry time has come, in discovery order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM frontier WHERE state = 'pending' AND next_attempt <= ? ORDER BY rowid", (time.time(),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def next_retry_at(self):
+        """When the next pending URL becomes due, or None when nothing is pending"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_attempt) FROM frontier WHERE state = 'pending'").fetchone()
+        return row[0]
+
+    def results(self):
+        """Products of the done URLs, in discovery order"""
+        with self._lock:
+            rows = self._conn.execute("SELECT product FROM frontier WHERE state = 'done' ORDER BY rowid").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in ('pending', 'done', 'failed')}
+
+    def checkpoint(self):
+        """Commit the work recorded since the last checkpoint"""
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def finish(self):
+        """Mark the crawl complete; the next start() begins a new one"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO crawl VALUES ('status', 'complete')")
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self.checkpoint()
+        self._conn.close()
+
+    def _tick(self):
+        # Call with the lock held
+        self._uncommitted += 1
+        if self._uncommitted >= CHECKPOINT_EVERY:
+            self._conn.commit()
+            self._uncommitted = 0
@@ -0,0 +1,98 @@
+import logging
+import math
+import os
+import re
+
+# Tokens of conversation history sent per turn, summary included
+HISTORY_TOKEN_BUDGET = int(os.getenv('LAFIANCEE_HISTORY_BUDGET', '3000'))
+# After a fold only this share of the budget stays verbatim, so the next
+# fold (and summary request) is several turns away
+KEEP_RATIO = 0.5
+# Role and separator tokens the API adds around every message
+MESSAGE_OVERHEAD = 4
+
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+log = logging.getLogger(__name__)
+
+
+def count_tokens(text):
+    """Estimate BPE tokens locally: ~4 characters per token, punctuation and emoji apart"""
+    return sum(math.ceil(len(t) / 4) for t in _TOKEN_RE.findall(text or ''))
+
+
+def message_tokens(message):
+    return count_tokens(message['content']) + MESSAGE_OVERHEAD
+
+
+class ConversationHistory:
+    """Token-budgeted view of a conversation with a rolling summary of older turns.
+
+    Recent messages are sent verbatim. When they no longer fit the budget,
+    the oldest ones are folded into the summary in one step down to
+    KEEP_RATIO of the budget, so the summary is refreshed every few turns
+    rather than on each one. One instance belongs to one conversation.
+    """
+
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, keep_ratio=KEEP_RATIO):
+        self.budget = budget
+        self.keep_ratio = keep_ratio
+        self.summary = ''
+        # Number of leading messages already folded into the summary
+        self.covered = 0
+
+    def reset(self):
+        self.summary = ''
+        self.covered = 0
+
+    def summary_message(self):
+        return {
+            "role": "system",
+            "content": f"RESUMEN DE LA CONVERSACIÓN ANTERIOR CON EL CLIENTE:\n{self.summary}",
+        }
+
+    def compact(self, messages, summarize):
+        """Return the messages to send: summary of older turns plus recent ones.
+
+        summarize(summary, messages) must return the previous summary
+        updated with those messages. If it fails, the oldest messages are
+        dropped from this request without being folded, and folding is
+        tried again next turn.
+        """
+        if len(messages) < self.covered:
+            # The conversation was cleared and started over
+            self.reset()
+
+        recent = messages[self.covered:]
+        summary_tokens = message_tokens(self.summary_message()) if self.summary else 0
+        if summary_tokens + sum(message_tokens(m) for m in recent) > self.budget:
+            # Keep the newest messages within the low watermark, and at least the last one
+            keep, used = 0, 0
+            for message in reversed(recent):
+                used += message_tokens(message)
+                if keep and used > self.budget * self.keep_ratio:
+                    break
+                keep += 1
+            folded = recent[:len(recent) - keep]
+            # Nothing to fold when the newest message alone is over budget
+            if folded:
+                try:
+                    self.summary = summarize(self.summary, folded)
+                    self.covered += len(folded)
+                except Exception as e:
+                    log.warning("Error summarizing conversation", extra={'error': str(e)})
+                    return self.fit(messages[self.covered:])
+
+        prefix = [self.summary_message()] if self.summary else []
+        return prefix + messages[self.covered:]
+
+    def fit(self, messages):
+        """Newest messages within the budget, without touching the summary"""
+        kept, used = [], message_tokens(self.summary_message()) if self.summary else 0
+        for message in reversed(messages):
+            used += message_tokens(message)
+            if kept and used > self.budget:
+                break
+            kept.append(message)
+        prefix = [self.summary_message()] if self.summary else []
+        return prefix + kept[::-1]
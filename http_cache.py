@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.getenv('LAFIANCEE_HTTP_CACHE', os.path.join('.cache', 'http_cache.sqlite3'))
+MAX_BYTES = 50 * 1024 * 1024
+MAX_AGE = 7 * 24 * 3600
+# Bump when the table changes; a cache file with another version starts empty
+SCHEMA_VERSION = 2
+
+
+class ResponseCache:
+    """SQLite-backed HTTP response cache with ETag/Last-Modified revalidation.
+
+    Besides the raw body, each entry can hold the parsed result of that body
+    so a page answered with 304 Not Modified is not parsed again, as long as
+    it was parsed by the same parser version. Entries expire max_age after
+    the body was downloaded, however often it is revalidated since.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS responses")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content BLOB NOT NULL,
+                parsed TEXT,
+                parser TEXT,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self.evict()
+
+    def conditional_headers(self, url):
+        """Return If-None-Match/If-Modified-Since headers for a cached URL that has not expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM responses WHERE url = ? AND stored_at >= ?",
+                (url, time.time() - self.max_age)
+            ).fetchone()
+        headers = {}
+        if row:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def revalidated(self, url):
+        """Record a 304 for url and return the cached body, or None if gone"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            # Only the LRU position: the entry still ages from its download
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+            self.hits += 1
+        return row[0]
+
+    def store(self, url, response):
+        """Store a fresh 200 response, dropping any previously parsed result"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        now = time.time()
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                # Nothing to revalidate with, so caching would never pay off
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, NULL, NULL, ?, ?, ?)",
+                    (url, etag, last_modified, response.content, len(response.content), now, now)
+                )
+            self._conn.commit()
+
+    def get_parsed(self, url, version):
+        """Return the result parser version stored for url, if any"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT parsed FROM responses WHERE url = ? AND parser = ?", (url, str(version))
+            ).fetchone()
+        if row and row[0] is not None:
+            return json.loads(row[0])
+        return None
+
+    def store_parsed(self, url, parsed, version):
+        """Attach a JSON-serializable parse result, made by parser version, to the cached body of url"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET parsed = ?, parser = ? WHERE url = ?",
+                (json.dumps(parsed, ensure_ascii=False), str(version), url)
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """Drop entries downloaded over max_age ago, then least recently used ones over max_bytes"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE stored_at < ?", (time.time() - self.max_age,)
+            )
+            self.evictions += cursor.rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute(
+                    "SELECT url, size FROM responses ORDER BY accessed_at"
+                ).fetchall()
+                for url, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                    total -= size
+                    self.evictions += 1
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
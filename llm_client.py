@@ -0,0 +1,264 @@
+"""Resilient chat completion calls shared by every session.
+
+LLMClient wraps the OpenAI client with:
+- a deadline per request, covering queueing, retries and backoff;
+- retries with jittered exponential backoff on 429, 5xx, timeouts and
+  connection errors, honouring Retry-After;
+- optional hedging: a request still unanswered after the p95 of recent
+  latencies is sent once more and the first answer wins;
+- one concurrency limit for the whole process, so a burst of sessions
+  queues here instead of piling onto the API;
+- optionally, a fallback model while the main one keeps answering 429 or
+  5xx; set LAFIANCEE_FALLBACK_MODEL to one that is really cheaper or faster.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+# Empty for no fallback
+FALLBACK_MODEL = os.getenv('LAFIANCEE_FALLBACK_MODEL', '')
+# Seconds a request may take, retries included
+DEADLINE = float(os.getenv('LAFIANCEE_LLM_DEADLINE', '30'))
+# Upstream requests in flight at once, across all sessions
+MAX_CONCURRENCY = int(os.getenv('LAFIANCEE_LLM_CONCURRENCY', '16'))
+HEDGE = os.getenv('LAFIANCEE_LLM_HEDGE', '0') == '1'
+HEDGE_QUANTILE = 0.95
+# Latency samples needed before hedging starts
+HEDGE_MIN_SAMPLES = 20
+MAX_RETRIES = 3
+# Seconds before the first retry, doubled on each attempt
+BACKOFF = 0.5
+MAX_BACKOFF = 8.0
+# Overload failures in a row that switch a model to the fallback, and for how long
+OVERLOAD_FAILURES = 3
+OVERLOAD_COOLDOWN = 30.0
+RETRY_STATUS = {408, 409, 429}
+
+log = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """No answer within the request's deadline"""
+
+
+def retryable(error):
+    """True for errors a later attempt may not hit: overload, server errors, timeouts"""
+    import openai
+
+    if isinstance(error, (DeadlineExceeded, openai.APIConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status is not None and (status in RETRY_STATUS or status >= 500)
+
+
+def overloaded(error):
+    """True for upstream answers saying the model is overloaded: 429 and 5xx"""
+    status = getattr(error, 'status_code', None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def retry_after(error):
+    """Seconds the server asked to wait before retrying, if it said so"""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Recent request latencies per model"""
+
+    def __init__(self, size=200):
+        self.size = size
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.size)).append(seconds)
+
+    def quantile(self, model, q):
+        """The q-quantile latency of model, or None with too few samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class OverloadTracker:
+    """Which models are overloaded and should be served by the fallback for now"""
+
+    def __init__(self, failures=OVERLOAD_FAILURES, cooldown=OVERLOAD_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def overloaded(self, model):
+        with self._lock:
+            return self._state.get(model, (0, 0))[1] > time.monotonic()
+
+    def failed(self, model):
+        with self._lock:
+            failures, until = self._state.get(model, (0, 0))
+            failures += 1
+            if failures >= self.failures:
+                failures, until = 0, time.monotonic() + self.cooldown
+            self._state[model] = (failures, until)
+
+    def succeeded(self, model):
+        with self._lock:
+            self._state.pop(model, None)
+
+
+class HeldStream:
+    """A streamed response that gives back its concurrency slot once consumed or closed"""
+
+    def __init__(self, stream, release):
+        self.stream = stream
+        self._release = release
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        try:
+            yield from self.stream
+        finally:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            release, self._release = self._release, None
+        if release:
+            release()
+            response = getattr(self.stream, 'response', None)
+            if response is not None:
+                response.close()
+
+
+# Shared by every LLMClient of the process
+limiter = threading.BoundedSemaphore(MAX_CONCURRENCY)
+latency = LatencyTracker()
+overload = OverloadTracker()
+_executor = ThreadPoolExecutor(max_workers=2 * MAX_CONCURRENCY, thread_name_prefix='llm')
+
+
+class LLMClient:
+    """chat.completions.create with deadlines, retries, hedging and model fallback.
+
+    Create the wrapped OpenAI client with max_retries=0: every attempt is
+    made here, within the request's deadline. Streamed responses hold
+    their concurrency slot until they are consumed or closed.
+    """
+
+    def __init__(self, client, fallback_model=FALLBACK_MODEL, deadline=DEADLINE, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF, hedge=HEDGE):
+        self.client = client
+        self.fallback_model = fallback_model
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge = hedge
+
+    def create(self, model, deadline=None, **request):
+        """Create a chat completion with model, or the fallback while model is overloaded"""
+        expires = time.monotonic() + (deadline or self.deadline)
+        for attempt in range(self.max_retries + 1):
+            current = self.fallback_model if self.fallback_model and overload.overloaded(model) else model
+            if current != model:
+                metrics.count('llm_fallbacks', model=current)
+            try:
+                response = self._attempt(dict(request, model=current), expires)
+                if current == model:
+                    overload.succeeded(model)
+                return response
+            except Exception as e:
+                if not retryable(e):
+                    raise
+                # Local limiter and deadline timeouts say nothing about the model
+                if current == model and overloaded(e):
+                    overload.failed(model)
+                delay = retry_after(e) or min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+                if attempt == self.max_retries or time.monotonic() + delay >= expires:
+                    raise
+                metrics.count('llm_retries', model=current)
+                log.warning("Retrying chat completion",
+                            extra={'model': current, 'delay': round(delay, 2), 'error': str(e)})
+                time.sleep(delay)
+
+    def _attempt(self, request, expires):
+        """One request, hedged by a second one if it is slower than usual"""
+        hedge_after = latency.quantile(request['model'], HEDGE_QUANTILE) if self.hedge else None
+        if hedge_after is None:
+            return self._send(request, expires)
+
+        first = _executor.submit(self._send, request, expires)
+        done, _ = wait([first], timeout=min(hedge_after, max(0, expires - time.monotonic())))
+        # Only hedge with a free slot: under load the extra request would just queue
+        if done or not limiter.acquire(blocking=False):
+            return self._result([first], expires)
+        metrics.count('llm_hedges', model=request['model'])
+        second = _executor.submit(self._send, request, expires, True)
+        return self._result([first, second], expires)
+
+    def _result(self, futures, expires):
+        """The first successful response of futures; the slower ones are closed"""
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0, expires - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for other in pending | (done - {future}):
+                        other.add_done_callback(_close_loser)
+                    return future.result()
+                error = error or future.exception()
+        for future in pending:
+            future.add_done_callback(_close_loser)
+        raise error or DeadlineExceeded('Sin respuesta del modelo dentro del plazo')
+
+    def _send(self, request, expires, holding=False):
+        """Send the request within a concurrency slot, timing out at expires"""
+        if not holding and not limiter.acquire(timeout=max(0, expires - time.monotonic())):
+            raise DeadlineExceeded('Demasiadas solicitudes en curso')
+        try:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded('Sin respuesta del modelo dentro del plazo')
+            start = time.monotonic()
+            labels = {'model': request['model'], 'stream': bool(request.get('stream'))}
+            with metrics.span('llm_request', **labels):
+                response = self.client.chat.completions.create(timeout=remaining, **request)
+            latency.record(request['model'], time.monotonic() - start)
+        except BaseException as e:
+            limiter.release()
+            metrics.count('llm_responses', model=request['model'], status=getattr(e, 'status_code', type(e).__name__))
+            raise
+        metrics.count('llm_responses', model=request['model'], status=200)
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            record_tokens(request['model'], usage.prompt_tokens, usage.completion_tokens)
+        if request.get('stream'):
+            return HeldStream(response, limiter.release)
+        limiter.release()
+        return response
+
+
+def record_tokens(model, prompt_tokens, completion_tokens, estimated=False):
+    """Count the prompt and completion tokens of one response"""
+    metrics.count('llm_tokens', prompt_tokens, model=model, kind='prompt', estimated=estimated)
+    metrics.count('llm_tokens', completion_tokens, model=model, kind='completion', estimated=estimated)
+
+
+def _close_loser(future):
+    if future.exception() is None and isinstance(future.result(), HeldStream):
+        future.result().close()
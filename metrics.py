@@ -0,0 +1,226 @@
+"""Process-wide instrumentation: timing spans, counters and structured logs.
+
+    with metrics.span('fetch', kind='product'):
+        ...
+    metrics.count('http_responses', status=200)
+
+Spans keep the latest samples of each (name, labels) for p50/p95 plus a
+running count and sum. Everything is exported in the Prometheus text
+format, to a file (LAFIANCEE_METRICS_FILE) and/or over HTTP
+(LAFIANCEE_METRICS_PORT, at /metrics). Logs go through the logging module;
+LAFIANCEE_LOG_FORMAT=json writes one JSON object per line with the
+record's extra fields, the text format appends them as key=value.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PREFIX = 'lafiancee'
+# Latest samples kept per span for its quantiles
+SAMPLES = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+LOG_FORMAT = os.getenv('LAFIANCEE_LOG_FORMAT', 'text')
+LOG_LEVEL = os.getenv('LAFIANCEE_LOG_LEVEL', 'INFO')
+METRICS_FILE = os.getenv('LAFIANCEE_METRICS_FILE', '')
+METRICS_PORT = int(os.getenv('LAFIANCEE_METRICS_PORT', '0'))
+# Seconds between rewrites of METRICS_FILE
+EXPORT_INTERVAL = 15
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class Metrics:
+    """Counters and latency samples, keyed by name and sorted label pairs"""
+
+    def __init__(self, samples=SAMPLES):
+        self.samples = samples
+        self._counters = {}
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            span = self._spans.get(key)
+            if span is None:
+                span = self._spans[key] = [0, 0.0, deque(maxlen=self.samples)]
+            span[0] += 1
+            span[1] += seconds
+            span[2].append(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the block; a block that raises is also counted in span_errors"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count('span_errors', span=name)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counters(self):
+        """{(name, labels): value}"""
+        with self._lock:
+            return dict(self._counters)
+
+    def spans(self):
+        """{(name, labels): {'count', 'sum', 'p50', 'p95', 'p99'}} with quantiles in seconds"""
+        with self._lock:
+            spans = {key: (count, total, sorted(samples)) for key, (count, total, samples) in self._spans.items()}
+        summary = {}
+        for key, (count, total, samples) in spans.items():
+            summary[key] = {'count': count, 'sum': total}
+            for q in QUANTILES:
+                summary[key][f"p{int(q * 100)}"] = samples[min(len(samples) - 1, int(len(samples) * q))]
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._spans.clear()
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, series in _by_name(self.counters()).items():
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines += [f"{PREFIX}_{name}_total{_labels(labels)} {value:g}" for labels, value in series]
+        for name, series in _by_name(self.spans()).items():
+            lines.append(f"# TYPE {PREFIX}_{name}_seconds summary")
+            for labels, summary in series:
+                for q in QUANTILES:
+                    quantile = labels + (('quantile', f"{q:g}"),)
+                    lines.append(f"{PREFIX}_{name}_seconds{_labels(quantile)} {summary[f'p{int(q * 100)}']:.6f}")
+                lines.append(f"{PREFIX}_{name}_seconds_sum{_labels(labels)} {summary['sum']:.6f}")
+                lines.append(f"{PREFIX}_{name}_seconds_count{_labels(labels)} {summary['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _key(name, labels):
+    # Label values are text once exported; as text, keys mixing status=200 and
+    # status='APITimeoutError' still sort
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _by_name(series):
+    grouped = {}
+    for (name, labels), value in sorted(series.items()):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels) + '}'
+
+
+# Shared by every module and session of the process
+registry = Metrics()
+count = registry.count
+observe = registry.observe
+span = registry.span
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per record, or text with the extra fields as key=value"""
+
+    def __init__(self, json_lines=False):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS}
+        if not self.json_lines:
+            text = super().format(record)
+            return ' '.join([text] + [f"{k}={v}" for k, v in fields.items()])
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **fields,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(log_format=LOG_FORMAT, level=LOG_LEVEL):
+    """Send the app's logs to stderr, unless logging was already configured"""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_lines=log_format == 'json'))
+    root.addHandler(handler)
+    root.setLevel(level)
+    # One INFO line per HTTP request is the client's, not ours; spans count them
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def write_file(path, metrics=registry):
+    """Write the Prometheus text to path atomically, for node_exporter's textfile collector"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(metrics.prometheus())
+    os.replace(tmp_path, path)
+
+
+def serve(port, metrics=registry):
+    """Serve the Prometheus text at /metrics from a daemon thread; returns the server"""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            data = metrics.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def start_exporters(path=METRICS_FILE, port=METRICS_PORT, interval=EXPORT_INTERVAL):
+    """Start the configured exporters; call once per process"""
+    log = logging.getLogger(__name__)
+    if port:
+        try:
+            serve(port)
+            log.info("Serving metrics", extra={'port': port})
+        except OSError as e:
+            log.error("Could not serve metrics", extra={'port': port, 'error': str(e)})
+    if path:
+        def export():
+            while True:
+                try:
+                    write_file(path)
+                except OSError as e:
+                    log.error("Could not write metrics file", extra={'path': path, 'error': str(e)})
+                time.sleep(interval)
+
+        threading.Thread(target=export, name='metrics-file', daemon=True).start()
@@ -0,0 +1,240 @@
+"""Fast product page extraction.
+
+Structured data (JSON-LD, og:/product: meta tags) is read straight from the
+raw HTML with precompiled regexes. A BeautifulSoup parse restricted by a
+SoupStrainer to the few candidate nodes only runs for fields still missing,
+and one table-driven pass fills every slot. Category and material come from
+precompiled keyword tables instead of chains of ``in`` tests.
+"""
+import html
+import json
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+# Required: without it the process should fail at import, not mid-scan
+import lxml  # noqa: F401
+
+import metrics
+
+PARSER = 'lxml'
+
+DESCRIPTION_LENGTH = 500
+
+CATEGORY_RULES = [
+    ('Cadenas', ['cadena']),
+    ('Pulseras', ['pulso', 'pulsera', 'brazalete']),
+    ('Aretes', ['topo', 'arete', 'pendiente']),
+    ('Anillos', ['anillo', 'argolla']),
+    ('Dijes', ['dije', 'colgante', 'medalla']),
+]
+DEFAULT_CATEGORY = 'Joyas'
+
+MATERIAL_RULES = [
+    ('Oro Amarillo 18K', ['oro amarillo']),
+    ('Oro Blanco 18K', ['oro blanco']),
+    ('Oro Rosa 18K', ['oro rosa', 'oro rosado']),
+    ('Tres Oros 18K', ['tres oros', '3 oros']),
+]
+DEFAULT_MATERIAL = 'Oro 18K'
+
+WEIGHT_RE = re.compile(r'(\d+[,.]?\d*)\s*gr')
+SIZE_RES = [(re.compile(r'(\d+)\s*cm'), 'cm'), (re.compile(r'(\d+)\s*mm'), 'mm')]
+
+# Fallback selectors in priority order: (field, tag, attribute, value);
+# value None means the attribute only has to be present
+SELECTORS = [
+    ('name', 'h1', 'class', 'product-title'),
+    ('name', 'h1', None, None),
+    ('price', 'span', 'class', 'money'),
+    ('price', 'span', 'data-product-price', None),
+    ('price', 'span', 'class', 'price'),
+    ('price', 'div', 'class', 'product-price'),
+    ('description', 'div', 'class', 'product-description'),
+    ('description', 'div', 'itemprop', 'description'),
+    ('description', 'div', 'class', 'description'),
+]
+
+_JSON_LD_RE = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I
+)
+_META_RE = re.compile(r'<meta\s[^>]*>', re.I)
+_ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_PRICE_META = ('product:price:amount', 'og:price:amount')
+_PRICE_RE = re.compile(r'\d[\d.,]*')
+_CENTS_RE = re.compile(r'[.,]\d{2}$')
+
+
+class KeywordClassifier:
+    """First matching rule wins, whatever the keyword's position in the text.
+
+    All keywords are compiled into one lookahead alternation, so a single
+    scan finds every (possibly overlapping) occurrence and the alternation
+    order picks the highest-priority rule at each position.
+    """
+
+    def __init__(self, rules, default):
+        self.labels = [label for label, _ in rules]
+        self.default = default
+        alternatives = '|'.join(
+            f"(?P<r{i}>{'|'.join(re.escape(k) for k in keywords)})"
+            for i, (_, keywords) in enumerate(rules)
+        )
+        self.pattern = re.compile(f"(?=(?:{alternatives}))")
+
+    def classify(self, text_lower):
+        best = len(self.labels)
+        for match in self.pattern.finditer(text_lower):
+            best = min(best, int(match.lastgroup[1:]))
+            if best == 0:
+                break
+        return self.labels[best] if best < len(self.labels) else self.default
+
+
+CATEGORIES = KeywordClassifier(CATEGORY_RULES, DEFAULT_CATEGORY)
+MATERIALS = KeywordClassifier(MATERIAL_RULES, DEFAULT_MATERIAL)
+# Every value the classifiers can return
+CATEGORY_LABELS = tuple(CATEGORIES.labels) + (DEFAULT_CATEGORY,)
+MATERIAL_LABELS = tuple(MATERIALS.labels) + (DEFAULT_MATERIAL,)
+
+
+def extract_weight(text_lower):
+    match = WEIGHT_RE.search(text_lower)
+    return match.group(1) + 'gr' if match else None
+
+
+def extract_size(text_lower):
+    for pattern, unit in SIZE_RES:
+        match = pattern.search(text_lower)
+        if match:
+            return match.group(1) + unit
+    return None
+
+
+def extract_attributes(name, description=''):
+    """Material, weight, size and category of a product, lower-casing once"""
+    with metrics.span('extract'):
+        text_lower = (description + ' ' + name).lower()
+        return {
+            'material': MATERIALS.classify(text_lower),
+            'weight': extract_weight(text_lower),
+            'size': extract_size(text_lower),
+            'category': CATEGORIES.classify(name.lower()),
+        }
+
+
+def format_price(text):
+    """'$1.250.000', '1250000.00' or '1.250.000,00' -> '$1250000'"""
+    match = _PRICE_RE.search(text or '')
+    if not match:
+        return None
+    digits = _CENTS_RE.sub('', match.group()).replace('.', '').replace(',', '')
+    return f"${digits}" if digits else None
+
+
+def structured_data(text):
+    """Name, price and description from JSON-LD Product data and meta tags"""
+    found = {}
+    for block in _JSON_LD_RE.findall(text):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        candidates = data if isinstance(data, list) else data.get('@graph', [data])
+        for item in candidates:
+            types = item.get('@type') if isinstance(item, dict) else None
+            if types != 'Product' and not (isinstance(types, list) and 'Product' in types):
+                continue
+            if item.get('name'):
+                found.setdefault('name', html.unescape(str(item['name'])).strip())
+            if item.get('description'):
+                found.setdefault('description', html.unescape(str(item['description'])).strip())
+            offers = item.get('offers') or []
+            offers = offers if isinstance(offers, list) else [offers]
+            prices = [float(o['price']) for o in offers if isinstance(o, dict) and o.get('price') not in (None, '')]
+            if prices:
+                found.setdefault('price', f"${int(round(min(prices)))}")
+
+    if len(found) < 3:
+        for tag in _META_RE.findall(text):
+            attrs = {k.lower(): a if a else b for k, a, b in _ATTR_RE.findall(tag)}
+            key = attrs.get('property') or attrs.get('name')
+            content = html.unescape(attrs.get('content', '')).strip()
+            if not content:
+                continue
+            if key == 'og:title':
+                found.setdefault('name', content)
+            elif key in _PRICE_META and format_price(content):
+                found.setdefault('price', format_price(content))
+            elif key == 'og:description':
+                found.setdefault('meta_description', content)
+    return found
+
+
+def _has_class(attrs, value):
+    classes = attrs.get('class') or ''
+    return value in (classes.split() if isinstance(classes, str) else classes)
+
+
+def _matches(tag, attrs, selector):
+    _, sel_tag, attr, value = selector
+    if tag != sel_tag:
+        return False
+    if attr is None:
+        return True
+    if attr == 'class':
+        return _has_class(attrs, value)
+    if value is None:
+        return attr in attrs
+    return attrs.get(attr) == value
+
+
+def _candidate(tag, attrs=None):
+    return any(_matches(tag, attrs or {}, s) for s in SELECTORS)
+
+
+STRAINER = SoupStrainer(_candidate)
+
+
+def soup_fallback(content, fields):
+    """Fill fields from the fallback selectors with one pass over the candidate nodes"""
+    soup = BeautifulSoup(content, PARSER, parse_only=STRAINER)
+    best = {}
+    for element in soup.find_all(True):
+        for priority, selector in enumerate(SELECTORS):
+            field = selector[0]
+            if field in fields and _matches(element.name, element.attrs, selector):
+                if field not in best or priority < best[field][0]:
+                    best[field] = (priority, element)
+    return {field: element.text.strip() for field, (_, element) in best.items()}
+
+
+def parse_product_page(content, url):
+    """Extract the product dict from a product page body"""
+    text = content.decode('utf-8', 'replace') if isinstance(content, bytes) else content
+    found = structured_data(text)
+
+    missing = {'name', 'price', 'description'} - found.keys()
+    if missing:
+        fallback = soup_fallback(content, missing)
+        if 'name' in fallback:
+            found['name'] = fallback['name']
+        if 'price' in fallback:
+            # Theme prices use dots and commas as thousands separators: $1.250.000
+            price = format_price(fallback['price'].replace('.', '').replace(',', ''))
+            if price:
+                found['price'] = price
+        if 'description' in fallback:
+            found['description'] = fallback['description']
+    if 'description' not in found and found.get('meta_description'):
+        found['description'] = found['meta_description']
+
+    product = {}
+    product['name'] = found.get('name') or url.split('/')[-1].replace('-', ' ').title()
+    if found.get('price'):
+        product['price'] = found['price']
+    if found.get('description'):
+        product['description'] = found['description'][:DESCRIPTION_LENGTH]
+
+    product.update(extract_attributes(product['name'], product.get('description', '')))
+    product['url'] = url
+    return product
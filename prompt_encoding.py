@@ -0,0 +1,153 @@
+"""Compact tabular encoding of catalog products for prompts.
+
+Products are written as rows under a single header instead of one
+labelled line each. Category and material are dictionary codes and URLs
+are product handles; both are declared once in the system prompt by
+legend(). Description sentences shared by several rows are listed once
+under the table, and sentences that only repeat the row's own columns
+(name, material, weight, size) are dropped.
+"""
+import re
+from collections import Counter
+from urllib.parse import urlparse
+
+from product_parser import CATEGORY_LABELS, MATERIAL_LABELS
+from retrieval import tokenize
+
+DESCRIPTION_LENGTH = 100
+COLUMNS = ['nombre', 'precio_cop', 'cat', 'mat', 'peso_g', 'tam_mm', 'url', 'desc']
+DEFAULT_BASE_URL = 'https://lafianceejoyas.co'
+# Words that carry nothing once weight and size have their own columns
+FILLER = frozenset(tokenize('peso gr g gramos cm mm largo tamaño medida 18k k'))
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_CELL_RE = re.compile(r'[|\n\r\0]+')
+
+
+def _codes(labels, make_code):
+    codes = {}
+    for label in labels:
+        code = make_code(label)
+        while code in codes.values():
+            code += str(len(codes))
+        codes[label] = code
+    return codes
+
+
+# 'Cadenas' -> 'CAD'; 'Oro Amarillo 18K' -> 'OA', 'Oro 18K' -> 'O'
+CATEGORY_CODES = _codes(CATEGORY_LABELS, lambda label: label[:3].upper())
+MATERIAL_CODES = _codes(
+    MATERIAL_LABELS, lambda label: ''.join(w[0] for w in label.split() if not w[0].isdigit()).upper()
+)
+
+
+def base_url(products):
+    """The store URL most product URLs start with"""
+    hosts = Counter(
+        f"{urlparse(p.url).scheme}://{urlparse(p.url).netloc}" for p in products if '/products/' in (p.url or '')
+    )
+    return hosts.most_common(1)[0][0] if hosts else DEFAULT_BASE_URL
+
+
+def legend(base):
+    """How to read the product tables; goes in the (cached) system prompt"""
+    categories = ', '.join(f"{code}={label}" for label, code in CATEGORY_CODES.items())
+    materials = ', '.join(f"{code}={label}" for label, code in MATERIAL_CODES.items())
+    return (
+        f"Los productos llegan en tablas con las columnas {'|'.join(COLUMNS)}. "
+        f"precio_cop en pesos colombianos, peso_g en gramos, tam_mm en milímetros; celda vacía = dato no disponible.\n"
+        f"- cat: {categories}\n"
+        f"- mat: {materials}\n"
+        f"- url es el handle del producto: el enlace completo es {base}/products/<url>\n"
+        f"- En desc, D1, D2... remiten a las descripciones comunes listadas debajo de la tabla"
+    )
+
+
+def _number(value):
+    if value is None:
+        return ''
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+
+def _cell(text):
+    return _CELL_RE.sub(' ', text or '').strip()
+
+
+def _handle(url, base):
+    prefix = f"{base}/products/"
+    return url[len(prefix):] if url and url.startswith(prefix) else (url or '')
+
+
+def _informative(sentence, known_tokens):
+    """False when a sentence only restates what the row's columns already say"""
+    return any(
+        t not in known_tokens and t not in FILLER and not t.isdigit()
+        for t in tokenize(sentence)
+    )
+
+
+def _sentences(text):
+    return [s for s in _SENTENCE_RE.split(text) if s]
+
+
+def _description(parts, codes):
+    """Join a row's description parts within DESCRIPTION_LENGTH, coding shared sentences as used.
+
+    parts holds (shared, text) pairs. Whole parts only, so a D-code is never
+    cut; a first sentence longer than the limit is the one part truncated.
+    Codes are numbered in order of first use, so the legend lists exactly
+    the codes the rows show.
+    """
+    kept = []
+    room = DESCRIPTION_LENGTH
+    for shared, text in parts:
+        piece = codes.get(text, f"D{len(codes) + 1}") if shared else text
+        cost = len(piece) + (1 if kept else 0)
+        if cost > room:
+            if not kept and not shared:
+                kept.append(piece[:room])
+            break
+        if shared:
+            codes[text] = piece
+        kept.append(piece)
+        room -= cost
+    return ' '.join(kept)
+
+
+def encode_products(products, base):
+    """Products as a header row, one row each and the shared descriptions below"""
+    descriptions = [_cell(p.description) for p in products]
+    candidates = {s for text in descriptions for s in _sentences(text)}
+    # Counted as substrings: run-on text ('50 cm Joya en oro...') still shares its sentences.
+    # Longest first, so a shared sentence is never split by a shorter one inside it; ties
+    # alphabetically, so the same products always encode to the same bytes
+    shared = sorted(
+        (s for s in candidates if sum(s in text for text in descriptions) > 1), key=lambda s: (-len(s), s)
+    )
+    codes = {}
+
+    rows = []
+    for p, text in zip(products, descriptions):
+        known = set(tokenize(' '.join(filter(None, [p.name, p.category, p.material]))))
+        for n, s in enumerate(shared):
+            if s not in text:
+                continue
+            text = text.replace(s, f"\0{n}\0" if _informative(s, known) else ' ')
+        parts = []
+        for i, piece in enumerate(text.split('\0')):
+            if i % 2:
+                parts.append((True, shared[int(piece)]))
+            else:
+                parts += [(False, s) for s in _sentences(piece.strip()) if _informative(s, known)]
+        rows.append('|'.join([
+            _cell(p.name),
+            _number(p.price_cop),
+            CATEGORY_CODES.get(p.category, _cell(p.category)),
+            MATERIAL_CODES.get(p.material, _cell(p.material)),
+            _number(p.weight_g),
+            _number(p.size_mm),
+            _handle(p.url, base),
+            _description(parts, codes),
+        ]))
+    legend = sorted(codes.items(), key=lambda item: int(item[1][1:]))
+    return '\n'.join(['|'.join(COLUMNS)] + rows + [f"{code}: {s}" for s, code in legend])
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from retrieval import normalize
+
+DEFAULT_PATH = os.getenv('LAFIANCEE_REPLY_CACHE', '')
+MAX_ENTRIES = 512
+TTL = 6 * 3600
+# Seconds a leader may hold an in-flight key before new callers stop waiting on it
+IN_FLIGHT_TTL = 60
+
+_SPACES_RE = re.compile(r'\s+')
+_EDGE_PUNCT = ' ¿?¡!.,;:'
+
+
+def normalize_message(text):
+    """Fold case, accents, whitespace and surrounding punctuation"""
+    return _SPACES_RE.sub(' ', normalize(text)).strip(_EDGE_PUNCT)
+
+
+class ReplyCache:
+    """LRU/TTL cache of assistant replies with in-flight request coalescing.
+
+    Keys cover the catalog version and the whole normalized conversation,
+    so a reply is only reused for the same question asked at the same point
+    of an identical conversation on the same catalog. With a path, entries
+    are also written through to SQLite and survive restarts. A leader that
+    has not finished within in_flight_ttl is presumed gone: its waiters are
+    released and the next caller leads instead.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, path=DEFAULT_PATH, in_flight_ttl=IN_FLIGHT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.in_flight_ttl = in_flight_ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS replies (key TEXT PRIMARY KEY, reply TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM replies WHERE created_at < ?", (time.time() - ttl,))
+            self._conn.commit()
+
+    def key(self, version, messages):
+        """Cache key for replying to messages on a catalog version"""
+        conversation = [[m['role'], normalize_message(m['content'])] for m in messages]
+        payload = json.dumps([version, conversation], ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, key):
+        """Return a fresh cached reply or None; call with the lock held"""
+        entry = self._entries.get(key)
+        if entry is None and self._conn is not None:
+            row = self._conn.execute(
+                "SELECT reply, created_at FROM replies WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                entry = self._entries[key] = (row[0], row[1])
+        if entry is None:
+            return None
+        if time.time() - entry[1] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, reply):
+        """Store a reply, evicting the least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (reply, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO replies VALUES (?, ?, ?)", (key, reply, now))
+                self._conn.execute(
+                    "DELETE FROM replies WHERE key NOT IN (SELECT key FROM replies ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+                self._conn.commit()
+
+    def begin(self, key):
+        """Look up key, coalescing with an identical request already in flight.
+
+        Returns (reply, future, leader):
+        - (reply, None, False) on a cache hit
+        - (None, future, False) when another caller is computing the reply;
+          future resolves to the reply, or None if that call failed
+        - (None, future, True) when the caller must compute the reply and
+          then call finish(key, future, reply)
+        """
+        with self._lock:
+            reply = self.get(key)
+            if reply is not None:
+                self.hits += 1
+                return reply, None, False
+            future, started = self._in_flight.get(key, (None, 0))
+            if future is not None and time.monotonic() - started < self.in_flight_ttl:
+                self.coalesced += 1
+                return None, future, False
+            if future is not None:
+                self.expired += 1
+                future.set_result(None)
+            self.misses += 1
+            future = Future()
+            self._in_flight[key] = (future, time.monotonic())
+            return None, future, True
+
+    def finish(self, key, future, reply):
+        """Publish the leader's reply (None on failure) to waiting callers"""
+        if reply is not None:
+            self.put(key, reply)
+        with self._lock:
+            if self._in_flight.get(key, (None,))[0] is future:
+                del self._in_flight[key]
+            if not future.done():
+                future.set_result(reply)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'expired': self.expired,
+                'entries': len(self._entries),
+            }
@@ -0,0 +1,130 @@
+"""BM25 product search used to pick the catalog slice sent to the model."""
+import math
+import re
+import unicodedata
+
+import numpy as np
+
+TOP_K = 12
+# Previous user turns still steer retrieval, at a lower weight than the new message
+HISTORY_TURNS = 3
+HISTORY_WEIGHT = 0.5
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset("""
+a al algo algun alguna alguno como con cual cuanto de del el ella en es esta este
+esto hay la las le lo los mas me mi mis muy no o para pero por que quiero se si sin
+su sus te tengo tu un una uno unos unas y ya yo busco tienen tienes hola gracias
+""".split())
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Lower-case and strip accents: 'Corazón' -> 'corazon'"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def stem(token):
+    """Light Spanish stemmer folding number and gender: anillos/anillo -> anill"""
+    if len(token) > 3 and token.endswith('s'):
+        token = token[:-1]
+    if len(token) > 3 and token[-1] in 'aeo':
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [stem(t) for t in _TOKEN_RE.findall(normalize(text)) if t not in STOPWORDS]
+
+
+def product_text(product):
+    """Searchable text of a product; the name is repeated to boost it over the description"""
+    return ' '.join([
+        product.name, product.name,
+        product.category or '', product.material or '',
+        product.description or '',
+    ])
+
+
+class ProductIndex:
+    """BM25 index over name, category, material and description.
+
+    Term weights are precomputed at build time, so a query is one vectorized
+    add per query term plus a partial sort.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        docs = [tokenize(product_text(p)) for p in products]
+        n_docs = len(docs)
+        avg_len = (sum(len(d) for d in docs) / n_docs) if n_docs else 0
+
+        postings = {}
+        for doc_id, tokens in enumerate(docs):
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            norm = K1 * (1 - B + B * len(tokens) / avg_len) if avg_len else K1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf * (K1 + 1) / (tf + norm)))
+
+        self.postings = {}
+        for token, entries in postings.items():
+            idf = math.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings[token] = (
+                np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries)),
+                np.fromiter((w * idf for _, w in entries), dtype=np.float32, count=len(entries)),
+            )
+
+    def search(self, query, k=TOP_K, history=()):
+        """Return up to k products ranked for query and recent user messages"""
+        return [self.products[i] for i in self.search_ids(query, k, history)]
+
+    def search_ids(self, query, k=TOP_K, history=()):
+        """Positions in products of the up to k best matches, best first"""
+        weights = {}
+        for text, weight in [(query, 1.0)] + [(h, HISTORY_WEIGHT) for h in history]:
+            for token in tokenize(text):
+                if token in self.postings:
+                    weights[token] = max(weights.get(token, 0), weight)
+        if not weights or not self.products:
+            return []
+
+        scores = np.zeros(len(self.products), dtype=np.float32)
+        for token, weight in weights.items():
+            doc_ids, impacts = self.postings[token]
+            scores[doc_ids] += impacts * weight
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(scores[hits], -k)[-k:]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return hits.tolist()
+
+
+def select_products(index, messages, k=TOP_K):
+    """Pick the products for this turn: search hits topped up with one per category.
+
+    General questions (shipping, warranty) match no product; the category
+    representatives still give the model real items to suggest.
+    """
+    user_turns = [m['content'] for m in messages if m['role'] == 'user']
+    if not user_turns:
+        selected = []
+    else:
+        selected = index.search(user_turns[-1], k=k, history=user_turns[-1 - HISTORY_TURNS:-1])
+
+    if len(selected) < k:
+        seen = {id(p) for p in selected}
+        categories = {p.category for p in selected}
+        for product in index.products:
+            if len(selected) >= k:
+                break
+            if id(product) not in seen and product.category not in categories:
+                selected.append(product)
+                seen.add(id(product))
+                categories.add(product.category)
+    return selected
@@ -0,0 +1,80 @@
+"""Versioned on-disk catalog snapshots for instant cold starts.
+
+A snapshot is JSON Lines: a header line with the format version, the
+catalog version, creation time, product count and a SHA-256 of the
+product lines, then one compact line per product including the derived
+fields (price_cop, weight_g, size_mm, category, material). Loading skips scraping and
+hashing the catalog, so a fresh process serves within milliseconds.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+from catalog import Catalog, Product
+
+DEFAULT_PATH = os.getenv('LAFIANCEE_SNAPSHOT', os.path.join('.cache', 'catalog.jsonl'))
+FORMAT = 'lafiancee-catalog'
+# Bump when Product fields change; older snapshots are then ignored
+FORMAT_VERSION = 2
+
+log = logging.getLogger(__name__)
+
+
+def save(catalog, path=DEFAULT_PATH):
+    """Write catalog to path, atomically replacing the previous snapshot"""
+    # With the typed fields: load() builds each Product from its row as is
+    lines = [
+        json.dumps(p.to_dict(derived=True), ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        for p in catalog.products
+    ]
+    body = ''.join(line + '\n' for line in lines).encode('utf-8')
+    header = {
+        'format': FORMAT,
+        'format_version': FORMAT_VERSION,
+        'version': catalog.version,
+        'created_at': time.time(),
+        'products': len(lines),
+        'sha256': hashlib.sha256(body).hexdigest(),
+        'tombstones': list(catalog.tombstones),
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load(path=DEFAULT_PATH):
+    """Return (catalog, created_at) from a snapshot, or None if it is missing, outdated or corrupt"""
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            body = f.read()
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.error("Error reading catalog snapshot", extra={'path': path, 'error': str(e)})
+        return None
+
+    if header.get('format') != FORMAT or header.get('format_version') != FORMAT_VERSION:
+        log.warning("Ignoring catalog snapshot: unsupported format",
+                    extra={'path': path, 'format_version': header.get('format_version')})
+        return None
+    if hashlib.sha256(body).hexdigest() != header.get('sha256'):
+        log.warning("Ignoring catalog snapshot: integrity check failed", extra={'path': path})
+        return None
+    try:
+        # One json.loads over all lines is several times faster than one per line
+        rows = json.loads(b'[' + body.rstrip(b'\n').replace(b'\n', b',') + b']')
+        products = [Product(**row) for row in rows]
+    except (TypeError, ValueError) as e:
+        log.error("Error reading catalog snapshot", extra={'path': path, 'error': str(e)})
+        return None
+    catalog = Catalog.build(products, version=header['version'], tombstones=header.get('tombstones', ()))
+    return catalog, header['created_at']
@@ -0,0 +1,65 @@
+import pytest
+
+import assistant
+import llm_client
+from bench.fake_openai import DEFAULT_REPLY, serve
+from bench.synthetic import synthetic_products
+from catalog import Catalog
+
+
+@pytest.fixture(scope='module')
+def fake_openai():
+    server, fake, url = serve(first_token_delay=0.01, token_delay=0.001)
+    yield fake, url
+    server.shutdown()
+
+
+@pytest.fixture
+def chat(fake_openai, monkeypatch, request):
+    _, url = fake_openai
+    monkeypatch.setenv('OPENAI_BASE_URL', url)
+    knowledge_base = Catalog.build(synthetic_products(50))
+    # One client per test: the API key picks it
+    api_key = f"sk-{request.node.name}"
+    return lambda text: assistant.chat_with_openai(
+        [{'role': 'user', 'content': text}], api_key, knowledge_base, stream=True
+    )
+
+
+def in_flight():
+    return len(assistant.reply_cache._in_flight)
+
+
+def test_streamed_reply_is_cached(chat):
+    reply = chat('¿Qué cadenas tienen?')
+    assert ''.join(reply) == DEFAULT_REPLY
+    assert llm_client.limiter._value == llm_client.MAX_CONCURRENCY
+    assert chat('¿Qué cadenas tienen?') == DEFAULT_REPLY
+
+
+@pytest.mark.parametrize('read', [0, 1])
+def test_abandoned_reply_frees_its_slot(chat, read):
+    reply = chat(f"¿Tienen dijes de oro rosa? {read}")
+    assert llm_client.limiter._value == llm_client.MAX_CONCURRENCY - 1
+    chunks = iter(reply)
+    for _ in range(read):
+        next(chunks)
+    reply.close()
+    assert llm_client.limiter._value == llm_client.MAX_CONCURRENCY
+
+
+def test_abandoned_reply_does_not_hold_its_question(chat):
+    question = '¿Tienen topos de oro blanco?'
+    chat(question).close()
+    assert in_flight() == 0
+
+    # Answered afresh instead of waiting on the abandoned reply
+    assert ''.join(chat(question)) == DEFAULT_REPLY
+
+
+def test_close_after_reading_is_harmless(chat):
+    reply = chat('¿Hacen envíos a Medellín?')
+    assert ''.join(reply) == DEFAULT_REPLY
+    reply.close()
+    assert llm_client.limiter._value == llm_client.MAX_CONCURRENCY
+    assert chat('¿Hacen envíos a Medellín?') == DEFAULT_REPLY
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import snapshot
+from catalog import Catalog, Product
+from catalog_worker import CatalogWorker
+
+
+class BlockingScraper:
+    """Scraper stand-in whose scans last until the test lets them finish"""
+
+    def __init__(self, gate, scans):
+        self.gate = gate
+        self.scans = scans
+        self.cache = None
+        self.error = None
+        self.changes = None
+        self.data = {'products': [{'name': 'Dije Virgen', 'url': 'https://lafianceejoyas.co/products/dije-virgen'}]}
+
+    def scrape_catalog(self, progress=None):
+        self.scans.append('full')
+        return self.gate.wait(5)
+
+    def refresh_incremental(self, previous, progress=None):
+        self.scans.append('incremental')
+        return self.gate.wait(5)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def make_worker(tmp_path):
+    path = str(tmp_path / 'catalog.jsonl')
+    snapshot.save(Catalog.build([Product.from_dict({'name': 'Topos', 'url': 'https://lafianceejoyas.co/products/topos'})]), path)
+    gate, scans = threading.Event(), []
+    worker = CatalogWorker(interval=0, scraper_factory=lambda: BlockingScraper(gate, scans), snapshot_path=path)
+    worker.start()
+    return worker, gate, scans
+
+
+def test_snapshot_is_served_without_scanning(tmp_path):
+    worker, _, scans = make_worker(tmp_path)
+    assert worker.status()['state'] == 'idle'
+    assert [p.name for p in worker.current().products] == ['Topos']
+    assert scans == []
+
+
+def test_trigger_reports_scanning_at_once(tmp_path):
+    worker, gate, scans = make_worker(tmp_path)
+    assert worker.trigger()
+    assert worker.status()['state'] == 'scanning'
+
+    gate.set()
+    wait_for(lambda: worker.status()['state'] == 'idle')
+    assert [p.name for p in worker.current().products] == ['Dije Virgen']
+    assert scans == ['incremental']
+
+
+def test_trigger_during_a_scan_is_not_queued(tmp_path):
+    worker, gate, scans = make_worker(tmp_path)
+    worker.trigger()
+    wait_for(lambda: scans)
+    assert not worker.trigger()
+
+    gate.set()
+    wait_for(lambda: worker.status()['state'] == 'idle')
+    time.sleep(0.1)
+    assert scans == ['incremental']
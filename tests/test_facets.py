@@ -0,0 +1,77 @@
+import pytest
+
+from assistant import search_products
+from bench.fake_store import load_fixture
+from catalog import Catalog, Product
+from facets import FacetIndex
+from retrieval import ProductIndex
+from scraper import LaFianceeJoyasScraper
+
+
+def fixture_products():
+    scraper = LaFianceeJoyasScraper(cache_path=None)
+    return [Product.from_dict(scraper.parse_product_json(item)) for item in load_fixture()['products']]
+
+
+@pytest.fixture(scope='module')
+def products():
+    return fixture_products()
+
+
+def names(products):
+    return [p.name for p in products]
+
+
+def test_filter_combines_facets(products):
+    index = FacetIndex(products)
+    bits = index.filter(category='Dijes', ranges=[('price_cop', None, 300000)])
+    assert [p.name for i, p in enumerate(products) if bits >> i & 1] == ['Dije Inicial Personalizada']
+    assert index.filter(category='Relojes') == 0
+
+
+def test_products_without_value_never_match_a_range(products):
+    index = FacetIndex(products)
+    matched = index.range_bitmap('size_mm', 0, 1000)
+    assert {p.name for i, p in enumerate(products) if matched >> i & 1} == {
+        p.name for p in products if p.size_mm is not None
+    }
+
+
+def test_results_sorted_by_price(products):
+    total, found = FacetIndex(products).search(category='Anillos')
+    assert total == 2
+    assert names(found) == ['Anillo Solitario Compromiso', 'Argollas Matrimonio Clásicas']
+    _, found = FacetIndex(products).search(category='Anillos', sort='price_desc')
+    assert names(found) == ['Argollas Matrimonio Clásicas', 'Anillo Solitario Compromiso']
+
+
+@pytest.mark.parametrize('query, sort', [
+    (None, None), (None, 'price_asc'), (None, 'price_desc'), ('dije', 'price_asc'), ('dije', 'price_desc'),
+])
+def test_products_without_price_come_last(query, sort):
+    products = [
+        Product.from_dict({'name': 'Dije sin precio'}),
+        Product.from_dict({'name': 'Dije barato', 'price': '$100000'}),
+        Product.from_dict({'name': 'Dije caro', 'price': '$900000'}),
+    ]
+    _, found = FacetIndex(products).search(query=query, text_index=ProductIndex(products), sort=sort)
+    assert found[-1].name == 'Dije sin precio'
+
+
+def test_query_ranks_without_hiding_facet_matches(products):
+    total, found = FacetIndex(products).search(
+        ranges=[('price_cop', None, 3000000)], query='virgen regalo esposa', text_index=ProductIndex(products)
+    )
+    assert total == len(found) == 8
+    assert found[0].name == 'Dije Virgen Milagrosa'
+
+
+def test_query_with_unknown_words_returns_the_facet_matches(products):
+    reply = search_products(Catalog.build(products), max_price_cop=3000000, query='regalo para mi esposa')
+    assert reply.startswith('8 productos coinciden; se muestran 8')
+
+
+def test_limit(products):
+    total, found = FacetIndex(products).search(limit=3)
+    assert total == 8
+    assert names(found) == ['Dije Inicial Personalizada', 'Dije Virgen Milagrosa', 'Topos Corazón Oro Rosa']
@@ -0,0 +1,27 @@
+import pytest
+
+from frontier import canonical_product_url
+
+BASE = 'https://lafianceejoyas.co'
+
+
+@pytest.mark.parametrize('url', [
+    'https://lafianceejoyas.co/products/dije-virgen',
+    'https://lafianceejoyas.co/products/dije-virgen/',
+    'https://lafianceejoyas.co/products/dije-virgen?variant=41000000001',
+    'https://lafianceejoyas.co/collections/dijes/products/dije-virgen',
+    'https://lafianceejoyas.co/products/dije-virgen.json',
+    '/collections/all/products/dije-virgen#reviews',
+])
+def test_product_urls_share_one_canonical_url(url):
+    assert canonical_product_url(url, BASE + '/') == f"{BASE}/products/dije-virgen"
+
+
+@pytest.mark.parametrize('url', [
+    'https://lafianceejoyas.co/collections/dijes',
+    'https://lafianceejoyas.co/products/',
+    'https://lafianceejoyas.co/pages/products',
+    'https://lafianceejoyas.co/',
+])
+def test_other_urls_are_not_products(url):
+    assert canonical_product_url(url, BASE) is None
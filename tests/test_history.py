@@ -0,0 +1,87 @@
+from history import ConversationHistory, message_tokens
+
+
+def user(text):
+    return {'role': 'user', 'content': text}
+
+
+def assistant(text):
+    return {'role': 'assistant', 'content': text}
+
+
+def conversation(turns):
+    messages = []
+    for n in range(turns):
+        messages += [user(f"Pregunta {n} sobre cadenas de oro " * 5), assistant(f"Respuesta {n} con opciones " * 5)]
+    return messages
+
+
+class Summarizer:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, summary, messages):
+        self.calls.append(list(messages))
+        if self.fail:
+            raise RuntimeError('sin conexión')
+        return f"{summary} +{len(messages)}".strip()
+
+
+def test_short_conversation_is_sent_verbatim():
+    summarize = Summarizer()
+    messages = conversation(2)
+    assert ConversationHistory(budget=3000).compact(messages, summarize) == messages
+    assert summarize.calls == []
+
+
+def test_fold_keeps_recent_messages_within_low_watermark():
+    history = ConversationHistory(budget=300)
+    summarize = Summarizer()
+    messages = conversation(10)
+    sent = history.compact(messages, summarize)
+
+    assert len(summarize.calls) == 1
+    assert summarize.calls[0] == messages[:history.covered]
+    assert sent[0]['role'] == 'system' and history.summary in sent[0]['content']
+    assert sent[1:] == messages[history.covered:]
+    assert sum(message_tokens(m) for m in sent[1:]) <= 300 * history.keep_ratio
+
+
+def test_no_new_fold_until_budget_is_exceeded_again():
+    history = ConversationHistory(budget=300)
+    summarize = Summarizer()
+    messages = conversation(10)
+    history.compact(messages, summarize)
+    history.compact(messages + [user('¿Y en oro rosa?')], summarize)
+    assert len(summarize.calls) == 1
+
+
+def test_oversized_last_message_is_not_summarized():
+    history = ConversationHistory(budget=50)
+    summarize = Summarizer()
+    messages = [user('palabra ' * 200)]
+    assert history.compact(messages, summarize) == messages
+    assert summarize.calls == []
+    assert history.covered == 0
+
+
+def test_failed_summary_drops_oldest_and_retries_next_turn():
+    history = ConversationHistory(budget=300)
+    messages = conversation(10)
+    sent = history.compact(messages, Summarizer(fail=True))
+    assert history.summary == '' and history.covered == 0
+    assert sent == messages[-len(sent):]
+    assert sum(message_tokens(m) for m in sent) <= 300
+
+    summarize = Summarizer()
+    history.compact(messages, summarize)
+    assert len(summarize.calls) == 1
+
+
+def test_cleared_conversation_resets_summary():
+    history = ConversationHistory(budget=300)
+    history.compact(conversation(10), Summarizer())
+    messages = [user('Hola')]
+    assert history.compact(messages, Summarizer()) == messages
+    assert history.summary == ''
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+import metrics
+import scraper
+from bench.fake_store import load_fixture, serve
+from http_cache import ResponseCache
+
+URL = 'https://lafianceejoyas.co/products/dije-virgen.json'
+
+
+class Response:
+    def __init__(self, content, etag='"v1"'):
+        self.content = content
+        self.headers = {'ETag': etag} if etag else {}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'http.sqlite3'))
+    yield cache
+    cache.close()
+
+
+def test_revalidation_reuses_body_and_parse(cache):
+    cache.store(URL, Response(b'{"product": {}}'))
+    assert cache.conditional_headers(URL) == {'If-None-Match': '"v1"'}
+    cache.store_parsed(URL, {'name': 'Dije'}, 1)
+    assert cache.revalidated(URL) == b'{"product": {}}'
+    assert cache.get_parsed(URL, 1) == {'name': 'Dije'}
+
+
+def test_parse_of_another_parser_version_is_ignored(cache):
+    cache.store(URL, Response(b'{}'))
+    cache.store_parsed(URL, {'name': 'Dije'}, 1)
+    assert cache.get_parsed(URL, 2) is None
+
+
+def test_new_body_drops_parse(cache):
+    cache.store(URL, Response(b'{}'))
+    cache.store_parsed(URL, {'name': 'Dije'}, 1)
+    cache.store(URL, Response(b'{"nuevo": 1}', etag='"v2"'))
+    assert cache.get_parsed(URL, 1) is None
+
+
+def test_response_without_validators_is_not_kept(cache):
+    cache.store(URL, Response(b'{}', etag=None))
+    assert cache.conditional_headers(URL) == {}
+    assert cache.revalidated(URL) is None
+
+
+def test_entries_age_from_download_not_revalidation(tmp_path):
+    path = str(tmp_path / 'http.sqlite3')
+    cache = ResponseCache(path, max_age=0.2)
+    cache.store(URL, Response(b'{}'))
+    for _ in range(3):
+        time.sleep(0.1)
+        cache.revalidated(URL)
+    # Expired: the next request is unconditional, and reopening drops it
+    assert cache.conditional_headers(URL) == {}
+    cache.close()
+    cache = ResponseCache(path, max_age=0.2)
+    assert cache.stats()['entries'] == 0
+    cache.close()
+
+
+def test_old_cache_file_starts_empty(tmp_path):
+    path = str(tmp_path / 'http.sqlite3')
+    cache = ResponseCache(path)
+    cache.store(URL, Response(b'{}'))
+    cache._conn.execute("PRAGMA user_version = 1")
+    cache._conn.commit()
+    cache.close()
+    cache = ResponseCache(path)
+    assert cache.stats()['entries'] == 0
+    cache.close()
+
+
+def test_scraper_reparses_unchanged_pages_after_a_parser_change(tmp_path, monkeypatch):
+    server, _, base = serve(load_fixture(), json_api=False)
+    path = str(tmp_path / 'http.sqlite3')
+    parse_hits = lambda: metrics.registry.counters().get(('parse_cache', (('result', 'hit'),)), 0)
+    try:
+        def scrape():
+            crawler = scraper.LaFianceeJoyasScraper(
+                requests_per_second=1000, cache_path=path, base_url=base, frontier_path=None
+            )
+            crawler.scrape_catalog(max_products=None)
+            crawler.cache.close()
+            return crawler.data['products']
+
+        first = scrape()
+        hits = parse_hits()
+        assert scrape() == first
+        assert parse_hits() > hits
+
+        monkeypatch.setattr(scraper, 'PARSER_VERSION', scraper.PARSER_VERSION + 1)
+        hits = parse_hits()
+        assert scrape() == first
+        assert parse_hits() == hits
+    finally:
+        server.shutdown()
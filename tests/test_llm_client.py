@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+import llm_client
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize('error, overloaded', [
+    (StatusError(429), True),
+    (StatusError(500), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (StatusError(401), False),
+    (llm_client.DeadlineExceeded(), False),
+    (ValueError('sin estado'), False),
+])
+def test_only_429_and_5xx_mean_overload(error, overloaded):
+    assert llm_client.overloaded(error) is overloaded
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Start a fault-injecting server; returns a function making (fake, LLMClient) pairs"""
+    import openai
+    from bench.fake_openai import serve
+
+    # Latency history and overload state are per process; each test starts clean
+    monkeypatch.setattr(llm_client, 'latency', llm_client.LatencyTracker())
+    monkeypatch.setattr(llm_client, 'overload', llm_client.OverloadTracker())
+    servers = []
+
+    def start(client_options=None, **fake_options):
+        server, fake, url = serve(**fake_options)
+        # Requests given up on mid-response are expected here, not worth a traceback
+        server.handle_error = lambda request, client_address: None
+        servers.append(server)
+        client = openai.OpenAI(api_key='test', base_url=url, max_retries=0)
+        return fake, llm_client.LLMClient(client, **dict({'backoff': 0.01}, **(client_options or {})))
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def create(client, **request):
+    return client.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'Hola'}], **request)
+
+
+def slots_free():
+    return llm_client.limiter._value == llm_client.MAX_CONCURRENCY
+
+
+def test_server_errors_are_retried(fake_openai):
+    fake, client = fake_openai(errors=[503, 502])
+    assert create(client).choices[0].message.content
+    assert len(fake.requests) == 3
+    assert slots_free()
+
+
+def test_retry_after_is_honoured(fake_openai):
+    fake, client = fake_openai(errors=[429], retry_after=0.3)
+    start = time.monotonic()
+    create(client)
+    assert time.monotonic() - start >= 0.3
+    assert len(fake.requests) == 2
+
+
+def test_client_errors_are_not_retried(fake_openai):
+    import openai
+
+    fake, client = fake_openai(errors=[400])
+    with pytest.raises(openai.BadRequestError):
+        create(client)
+    assert len(fake.requests) == 1
+    assert slots_free()
+
+
+def test_retries_stop_at_the_last_attempt(fake_openai):
+    import openai
+
+    fake, client = fake_openai({'max_retries': 2}, error_rate=1.0)
+    with pytest.raises(openai.InternalServerError):
+        create(client)
+    assert len(fake.requests) == 3
+    assert slots_free()
+
+
+def test_deadline_covers_retries(fake_openai):
+    _, client = fake_openai({'deadline': 0.3}, first_token_delay=1.0)
+    start = time.monotonic()
+    with pytest.raises(Exception) as raised:
+        create(client)
+    assert llm_client.retryable(raised.value)
+    assert time.monotonic() - start < 0.9
+    assert slots_free()
+
+
+def test_full_limiter_times_out_without_marking_overload(fake_openai, monkeypatch):
+    fake, client = fake_openai()
+    monkeypatch.setattr(llm_client, 'limiter', threading.BoundedSemaphore(1))
+    llm_client.limiter.acquire()
+    with pytest.raises(llm_client.DeadlineExceeded):
+        create(client, deadline=0.2)
+    assert fake.requests == []
+    assert not llm_client.overload.overloaded('gpt-4o-mini')
+
+
+def test_overloaded_model_falls_back(fake_openai):
+    fake, client = fake_openai({'fallback_model': 'fallback-model'},
+                               error_rate=1.0, error_status=429, error_models={'gpt-4o-mini'})
+    assert create(client).model == 'fallback-model'
+    assert [r['model'] for r in fake.requests] == ['gpt-4o-mini'] * 3 + ['fallback-model']
+
+
+def test_streamed_response_holds_its_slot_until_consumed(fake_openai):
+    _, client = fake_openai()
+    stream = create(client, stream=True)
+    assert llm_client.limiter._value == llm_client.MAX_CONCURRENCY - 1
+    assert ''.join(chunk.choices[0].delta.content or '' for chunk in stream)
+    assert slots_free()
+
+
+def test_losing_hedged_stream_is_closed(fake_openai):
+    # Seed 9: the first request gets the slow delay, the hedged one does not
+    fake, client = fake_openai({'hedge': True}, slow_rate=0.5, slow_delay=0.5, seed=9)
+    for _ in range(llm_client.HEDGE_MIN_SAMPLES):
+        llm_client.latency.record('gpt-4o-mini', 0.05)
+
+    start = time.monotonic()
+    stream = create(client, stream=True)
+    assert time.monotonic() - start < 0.4
+    assert ''.join(chunk.choices[0].delta.content or '' for chunk in stream)
+    assert len(fake.requests) == 2
+
+    # The slow request answers later and is closed, giving its slot back
+    deadline = time.monotonic() + 5
+    while not slots_free():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
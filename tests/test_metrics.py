@@ -0,0 +1,44 @@
+from metrics import Metrics, write_file
+
+
+def test_counters_and_spans_by_labels():
+    metrics = Metrics()
+    metrics.count('http_responses', status=200)
+    metrics.count('http_responses', 2, status=200)
+    metrics.count('http_bytes', 512)
+    with metrics.span('parse', kind='listing'):
+        pass
+    assert metrics.counters() == {
+        ('http_responses', (('status', '200'),)): 3,
+        ('http_bytes', ()): 512,
+    }
+    assert metrics.spans()[('parse', (('kind', 'listing'),))]['count'] == 1
+
+
+def test_failed_span_is_counted():
+    metrics = Metrics()
+    try:
+        with metrics.span('fetch'):
+            raise ValueError('sin respuesta')
+    except ValueError:
+        pass
+    assert metrics.counters() == {('span_errors', (('span', 'fetch'),)): 1}
+
+
+def test_label_values_of_mixed_types_export(tmp_path):
+    metrics = Metrics()
+    metrics.count('llm_responses', model='gpt-4o-mini', status=200)
+    metrics.count('llm_responses', model='gpt-4o-mini', status='APITimeoutError')
+    metrics.count('llm_tokens', 10, model='gpt-4o-mini', estimated=True)
+    metrics.observe('llm_request', 0.5, status=200)
+    metrics.observe('llm_request', 1.5, status='APITimeoutError')
+
+    text = metrics.prometheus()
+    assert 'lafiancee_llm_responses_total{model="gpt-4o-mini",status="200"} 1' in text
+    assert 'lafiancee_llm_responses_total{model="gpt-4o-mini",status="APITimeoutError"} 1' in text
+    assert 'lafiancee_llm_tokens_total{estimated="True",model="gpt-4o-mini"} 10' in text
+    assert sorted(metrics.counters().items()) and sorted(metrics.spans().items())
+
+    path = tmp_path / 'metrics.prom'
+    write_file(str(path), metrics)
+    assert path.read_text(encoding='utf-8') == text
@@ -0,0 +1,66 @@
+import pytest
+
+from bench.bench_parser import rendered_pages
+from bench.fake_store import FakeStore, load_fixture
+from product_parser import CATEGORIES, MATERIALS, extract_attributes, format_price, parse_product_page
+
+
+@pytest.mark.parametrize('text, category', [
+    ('dije cadena virgen', 'Cadenas'),
+    ('colgante con cadena', 'Cadenas'),
+    ('pulsera con dije de corazón', 'Pulseras'),
+    ('topos corazón', 'Aretes'),
+    ('argollas matrimonio', 'Anillos'),
+    ('medalla virgen milagrosa', 'Dijes'),
+    ('set de regalo', 'Joyas'),
+])
+def test_category_first_rule_wins_wherever_it_appears(text, category):
+    assert CATEGORIES.classify(text) == category
+
+
+@pytest.mark.parametrize('text, material', [
+    ('en oro blanco y oro amarillo', 'Oro Amarillo 18K'),
+    ('oro rosado', 'Oro Rosa 18K'),
+    ('pulsera 3 oros', 'Tres Oros 18K'),
+    ('oro 18k italiano', 'Oro 18K'),
+])
+def test_material(text, material):
+    assert MATERIALS.classify(text) == material
+
+
+def test_extract_attributes():
+    attributes = extract_attributes('Cadena Lazo Oro Blanco 18K', 'Peso: 3,1 gr. Largo: 45 cm.')
+    assert attributes == {'material': 'Oro Blanco 18K', 'weight': '3,1gr', 'size': '45cm', 'category': 'Cadenas'}
+    assert extract_attributes('Topos Corazón')['weight'] is None
+
+
+@pytest.mark.parametrize('text, price', [
+    ('$1.250.000', '$1250000'),
+    ('1250000.00', '$1250000'),
+    ('1.250.000,00', '$1250000'),
+    ('Agotado', None),
+    (None, None),
+])
+def test_format_price(text, price):
+    assert format_price(text) == price
+
+
+@pytest.mark.parametrize('structured_data', [True, False])
+def test_parse_product_page_with_and_without_structured_data(structured_data):
+    store = FakeStore(load_fixture(), structured_data=structured_data)
+    item = store.catalog['products'][1]
+    url = f"https://lafianceejoyas.co/products/{item['handle']}"
+    product = parse_product_page(store.product_html(item).encode('utf-8'), url)
+    assert product['name'] == item['title']
+    assert product['price'] == '$1390000'
+    assert product['category'] == 'Cadenas'
+    assert product['material'] == 'Oro Blanco 18K'
+    assert product['url'] == url
+
+
+def test_both_extraction_paths_agree():
+    for (with_data, url), (without_data, _) in zip(rendered_pages(20, True), rendered_pages(20, False)):
+        structured, fallback = parse_product_page(with_data, url), parse_product_page(without_data, url)
+        # The theme's description markup only changes whitespace
+        structured.pop('description'), fallback.pop('description')
+        assert structured == fallback
@@ -0,0 +1,87 @@
+import os
+import re
+import subprocess
+import sys
+
+import prompt_encoding
+from catalog import Product
+
+SHARED = [
+    'Joya en oro 18K italiano con certificado de garantía.',
+    'Envío asegurado a toda Colombia.',
+    'Incluye estuche de regalo y limpieza gratuita de por vida.',
+    # Same length: only their text can order them
+    'Garantía total.',
+    'Envío gratuito.',
+]
+CODE_RE = re.compile(r'\bD\d*\b')
+
+
+def products(lead_length):
+    return [
+        Product.from_dict({
+            'name': f"Dije {n}",
+            'category': 'Dijes',
+            'material': 'Oro 18K',
+            'price': f"${n + 1}00000",
+            'url': f"https://lafianceejoyas.co/products/dije-{n}",
+            'description': f"Diseño exclusivo número {n} {'x' * lead_length}. " + ' '.join(SHARED),
+        })
+        for n in range(6)
+    ]
+
+
+def rows_and_legend(encoded):
+    lines = encoded.split('\n')
+    rows = [line for line in lines[1:] if '|' in line]
+    legend = [line for line in lines[1:] if '|' not in line]
+    return rows, legend
+
+
+def test_one_row_per_product_under_the_header():
+    encoded = prompt_encoding.encode_products(products(0), prompt_encoding.DEFAULT_BASE_URL)
+    rows, legend = rows_and_legend(encoded)
+    assert encoded.split('\n')[0] == '|'.join(prompt_encoding.COLUMNS)
+    assert [row.split('|')[:7] for row in rows] == [
+        [f"Dije {n}", f"{n + 1}00000", 'DIJ', 'O', '', '', f"dije-{n}"] for n in range(6)
+    ]
+    assert len(legend) == len(SHARED)
+
+
+def test_shared_sentences_are_listed_once():
+    encoded = prompt_encoding.encode_products(products(0), prompt_encoding.DEFAULT_BASE_URL)
+    rows, legend = rows_and_legend(encoded)
+    assert len(rows) == 6
+    assert sorted(line.split(': ', 1)[1] for line in legend) == sorted(SHARED)
+    assert all(row.endswith('D1 D2 D3 D4 D5') for row in rows)
+
+
+def test_codes_are_never_cut_and_legend_lists_only_used_ones():
+    for lead_length in range(0, 90, 3):
+        encoded = prompt_encoding.encode_products(products(lead_length), prompt_encoding.DEFAULT_BASE_URL)
+        rows, legend = rows_and_legend(encoded)
+        used = {code for row in rows for code in CODE_RE.findall(row.rsplit('|', 1)[1])}
+        listed = [line.split(':', 1)[0] for line in legend]
+        assert 'D' not in used
+        assert set(listed) == used
+        assert listed == [f"D{n}" for n in range(1, len(listed) + 1)]
+        assert all(len(row.rsplit('|', 1)[1]) <= prompt_encoding.DESCRIPTION_LENGTH for row in rows)
+
+
+def test_encoding_does_not_depend_on_hash_seed():
+    script = (
+        "from bench.synthetic import synthetic_products\n"
+        "from tests.test_prompt_encoding import products as tied\n"
+        "import prompt_encoding\n"
+        "for products in (tied(0), synthetic_products(40)):\n"
+        "    print(prompt_encoding.encode_products(products, prompt_encoding.base_url(products)))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = {
+        subprocess.run(
+            [sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True,
+            env=dict(os.environ, PYTHONHASHSEED=seed),
+        ).stdout
+        for seed in ('1', '2', '3')
+    }
+    assert len(outputs) == 1
@@ -0,0 +1,64 @@
+import threading
+
+from response_cache import ReplyCache, normalize_message
+
+MESSAGES = [{'role': 'user', 'content': '¿Tienen cadenas de oro blanco?'}]
+
+
+def test_normalized_questions_share_a_key():
+    cache = ReplyCache(path=None)
+    same = [{'role': 'user', 'content': '  tienen CADENAS de oro blanco '}]
+    assert normalize_message(MESSAGES[0]['content']) == normalize_message(same[0]['content'])
+    assert cache.key('v1', MESSAGES) == cache.key('v1', same)
+    assert cache.key('v1', MESSAGES) != cache.key('v2', MESSAGES)
+
+
+def test_leader_reply_reaches_waiters_and_cache():
+    cache = ReplyCache(path=None)
+    key = cache.key('v1', MESSAGES)
+    reply, future, leader = cache.begin(key)
+    assert reply is None and leader
+    _, waiting, follower = cache.begin(key)
+    assert waiting is future and not follower
+
+    cache.finish(key, future, 'Sí, tenemos varias.')
+    assert waiting.result(timeout=1) == 'Sí, tenemos varias.'
+    assert cache.begin(key) == ('Sí, tenemos varias.', None, False)
+    assert cache.stats()['coalesced'] == 1
+
+
+def test_failed_leader_is_not_cached():
+    cache = ReplyCache(path=None)
+    key = cache.key('v1', MESSAGES)
+    _, future, _ = cache.begin(key)
+    cache.finish(key, future, None)
+    assert future.result(timeout=1) is None
+    assert cache.begin(key)[2]
+
+
+def test_stale_leader_is_replaced():
+    cache = ReplyCache(path=None, in_flight_ttl=0.05)
+    key = cache.key('v1', MESSAGES)
+    _, abandoned, _ = cache.begin(key)
+    threading.Event().wait(0.1)
+
+    reply, future, leader = cache.begin(key)
+    assert reply is None and leader and future is not abandoned
+    assert abandoned.result(timeout=1) is None
+    assert cache.stats()['expired'] == 1
+
+    # A late finish of the stale leader still caches its reply but leaves the new leader alone
+    cache.finish(key, abandoned, 'tarde')
+    assert not future.done()
+    assert cache.begin(key)[0] == 'tarde'
+    cache.finish(key, future, 'a tiempo')
+    assert future.result(timeout=1) == 'a tiempo'
+
+
+def test_replies_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'replies.sqlite3')
+    cache = ReplyCache(path=path)
+    key = cache.key('v1', MESSAGES)
+    _, future, _ = cache.begin(key)
+    cache.finish(key, future, 'Sí')
+    assert ReplyCache(path=path).begin(key)[0] == 'Sí'
@@ -0,0 +1,79 @@
+import pytest
+
+from bench.fake_store import load_fixture, serve
+from catalog import Catalog
+from scraper import LaFianceeJoyasScraper
+
+
+@pytest.fixture(params=[True, False], ids=['json', 'html'])
+def store(request):
+    server, store, base = serve(load_fixture(), json_api=request.param)
+    yield store, base
+    server.shutdown()
+
+
+def scraper(base):
+    return LaFianceeJoyasScraper(requests_per_second=1000, cache_path=None, base_url=base, frontier_path=None)
+
+
+def test_scrape_catalog(store):
+    _, base = store
+    first = scraper(base)
+    assert first.scrape_catalog(max_products=None)
+    catalog = Catalog.from_data(first.data)
+    assert len(catalog.products) == 8
+    assert len({p.url for p in catalog.products}) == 8
+    assert all(p.url.startswith(f"{base}/products/") and p.price_cop for p in catalog.products)
+
+
+def test_refresh_of_unchanged_store_reports_no_changes(store):
+    _, base = store
+    first = scraper(base)
+    first.scrape_catalog(max_products=None)
+    catalog = Catalog.from_data(first.data)
+
+    refresh = scraper(base)
+    assert refresh.refresh_incremental(catalog.to_data(), max_products=None)
+    assert refresh.changes == {'added': 0, 'updated': 0, 'removed': 0}
+    assert [p['url'] for p in refresh.data['products']] == [p.url for p in catalog.products]
+
+
+def test_refresh_reports_removed_products(store):
+    fake, base = store
+    first = scraper(base)
+    first.scrape_catalog(max_products=None)
+    catalog = Catalog.from_data(first.data)
+
+    gone = fake.catalog['products'].pop()
+    refresh = scraper(base)
+    refresh.refresh_incremental(catalog.to_data(), max_products=None)
+    assert refresh.changes == {'added': 0, 'updated': 0, 'removed': 1}
+    assert [t['name'] for t in refresh.data['tombstones']] == [gone['title']]
+
+
+def test_missing_product_json_does_not_switch_the_scan_to_html(monkeypatch):
+    server, fake, base = serve(load_fixture(), json_api=True)
+    try:
+        first = scraper(base)
+        first.scrape_catalog(max_products=None)
+        previous = Catalog.from_data(first.data).to_data()
+        # Without lastmod every known product is fetched again
+        for product in previous['products']:
+            del product['lastmod']
+        # Deleted after the sitemap was read: its .json and page answer 404
+        deleted = previous['products'][0]['url'].rsplit('/', 1)[1]
+        del fake.products[deleted]
+
+        paths = []
+        route = fake.route
+        monkeypatch.setattr(fake, 'route', lambda path, query: paths.append(path) or route(path, query))
+        refresh = LaFianceeJoyasScraper(
+            requests_per_second=1000, max_in_flight=1, cache_path=None, base_url=base, frontier_path=None
+        )
+        assert refresh.refresh_incremental(previous, max_products=None)
+        assert refresh.json_api is True
+        pages = [p for p in paths if p.startswith('/products/') and not p.endswith('.json')]
+        assert pages == [f"/products/{deleted}"]
+        assert len([p for p in paths if p.endswith('.json') and p.startswith('/products/')]) == 8
+    finally:
+        server.shutdown()
@@ -0,0 +1,43 @@
+import snapshot
+from bench.fake_store import load_fixture
+from catalog import Catalog, Product
+from scraper import LaFianceeJoyasScraper
+
+
+def fixture_products():
+    scraper = LaFianceeJoyasScraper(cache_path=None)
+    return [Product.from_dict(scraper.parse_product_json(item)) for item in load_fixture()['products']]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'catalog.jsonl')
+    catalog = Catalog.build(fixture_products(), tombstones=[{'url': 'https://lafianceejoyas.co/products/x', 'name': 'X'}])
+    snapshot.save(catalog, path)
+    loaded, created_at = snapshot.load(path)
+    assert loaded == catalog
+    assert created_at > 0
+
+
+def test_round_trip_keeps_catalog_version(tmp_path):
+    path = str(tmp_path / 'catalog.jsonl')
+    catalog = Catalog.build(fixture_products())
+    snapshot.save(catalog, path)
+    loaded, _ = snapshot.load(path)
+    assert loaded.version == Catalog.from_data(catalog.to_data()).version == catalog.version
+
+
+def test_missing_or_corrupt_snapshot_is_ignored(tmp_path):
+    path = str(tmp_path / 'catalog.jsonl')
+    assert snapshot.load(path) is None
+    snapshot.save(Catalog.build(fixture_products()), path)
+    with open(path, 'r+b') as f:
+        f.seek(-10, 2)
+        f.write(b'0000000000')
+    assert snapshot.load(path) is None
+
+
+def test_other_format_version_is_ignored(tmp_path, monkeypatch):
+    path = str(tmp_path / 'catalog.jsonl')
+    snapshot.save(Catalog.build(fixture_products()), path)
+    monkeypatch.setattr(snapshot, 'FORMAT_VERSION', snapshot.FORMAT_VERSION + 1)
+    assert snapshot.load(path) is None